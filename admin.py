@@ -1,18 +1,29 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
+from edits import edit_message
+from datetime import datetime
+import io
 import logging
-from config import ANIME_NAME, ANIME_DESCRIPTION, ANIME_CODE, ANIME_IMAGE, ANIME_VIDEO, ANIME_EPISODE_NUMBER, ANIME_EPISODE_URL
+import time
+from config import ANIME_NAME, ANIME_DESCRIPTION, ANIME_CODE, ANIME_IMAGE, ANIME_VIDEO, ANIME_EPISODE_NUMBER, ANIME_EPISODE_URL, ANIME_RELEASE, ANIME_GENRES, ANIME_STATUS, PROFILE_DEFAULT_SECONDS
+from scheduler import parse_release_time, format_release_time, pending_releases
+from profiler import profile_cpu, profile_memory, is_capture_running, clamp_duration
+from backup import create_backup, restore_backup, list_backups
+from facets import parse_genres
+from stats import get_stats, SIGNUPS, VIP_ADDED, VIP_REMOVED, ANIMES_ADDED, ANIMES_DELETED, EPISODES_ADDED, EPISODES
+from antiflood import get_flood_stats
+from edits import get_edit_stats
+from gateway import get_gateway_stats
+from subscriptions import count_subscriptions
+from notifier import get_notify_stats
 from database import (
     is_admin, load_data, generate_anime_id, add_anime_to_db, 
-    delete_anime_from_db, add_episode_to_anime, load_users, 
-    toggle_user_vip
+    delete_anime_from_db, add_episode_to_anime, count_users,
+    count_vip_users, list_users, toggle_user_vip, get_anime_by_id,
+    toggle_anime_completed, count_animes
 )
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -20,20 +31,22 @@ async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     query = update.callback_query
     
     if not is_admin(query.from_user.id):
-        await query.edit_message_text("Sizda admin huquqlari yo'q!")
+        await edit_message(query, "Sizda admin huquqlari yo'q!")
         return
     
     keyboard = [
         [InlineKeyboardButton("➕ Anime qo'shish", callback_data="add_anime")],
         [InlineKeyboardButton("🗑️ Anime o'chirish", callback_data="delete_anime")],
         [InlineKeyboardButton("🎬 Epizod qo'shish", callback_data="add_episode")],
+        [InlineKeyboardButton("⏰ Rejalashtirilganlar", callback_data="scheduled_releases")],
+        [InlineKeyboardButton("📊 Statistika", callback_data="statistics")],
         [InlineKeyboardButton("👑 VIP boshqarish", callback_data="manage_vip")],
         [InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")]
     ]
     
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await query.edit_message_text(
+    await edit_message(query,
         "Admin panel:",
         reply_markup=reply_markup
     )
@@ -53,11 +66,103 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     else:
         await update.message.reply_text("Sizda admin huquqlari yo'q!")
 
+def _profile_seconds(context):
+    """Read the optional duration argument of a profiling command."""
+    try:
+        return clamp_duration(context.args[0]) if context.args else PROFILE_DEFAULT_SECONDS
+    except ValueError:
+        return PROFILE_DEFAULT_SECONDS
+
+async def _run_profile(update: Update, context: ContextTypes.DEFAULT_TYPE, capture, name: str) -> None:
+    """Run a profiling capture and send the report back as a document."""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("Sizda admin huquqlari yo'q!")
+        return
+    
+    if is_capture_running():
+        await update.message.reply_text("Profil allaqachon yozilmoqda, kuting.")
+        return
+    
+    seconds = _profile_seconds(context)
+    await update.message.reply_text(f"Profil yozilmoqda ({seconds}s)...")
+    
+    try:
+        report = await capture(seconds)
+    except Exception as e:
+        logger.error(f"Error while profiling: {e}")
+        await update.message.reply_text(f"Profil yozishda xatolik: {e}")
+        return
+    
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    await update.message.reply_document(
+        document=io.BytesIO(report.encode("utf-8")),
+        filename=filename,
+        caption=f"Profil tayyor ({seconds}s)"
+    )
+
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Command handler for /profile [seconds] - CPU profile of the event loop."""
+    # Run in the background so the capture window sees normal traffic
+    context.application.create_task(
+        _run_profile(update, context, profile_cpu, "cpu_profile"), update=update
+    )
+
+async def memprofile_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Command handler for /memprofile [seconds] - tracemalloc snapshot diff."""
+    context.application.create_task(
+        _run_profile(update, context, profile_memory, "memory_profile"), update=update
+    )
+
+async def backup_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Command handler for /backup - take a backup now and report it."""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("Sizda admin huquqlari yo'q!")
+        return
+    
+    try:
+        report = await create_backup()
+    except Exception as e:
+        logger.error(f"Error while backing up: {e}")
+        await update.message.reply_text(f"Zaxira nusxa olishda xatolik: {e}")
+        return
+    
+    await update.message.reply_text(
+        f"✅ Zaxira nusxa: {report['name']}\n"
+        f"📦 Hajmi: {report['size'] / 1024:.1f} KB ({report['raw_size'] / 1024:.1f} KB siqilmagan)\n"
+        f"⏱ Vaqt: {report['duration_ms']:.0f} ms (snapshot {report['snapshot_ms']:.1f} ms)"
+    )
+
+async def restore_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Command handler for /restore [name] - list backups or restore one."""
+    if not is_admin(update.effective_user.id):
+        await update.message.reply_text("Sizda admin huquqlari yo'q!")
+        return
+    
+    if not context.args:
+        backups = list_backups()
+        if not backups:
+            await update.message.reply_text("Zaxira nusxalar yo'q.")
+            return
+        await update.message.reply_text(
+            "Zaxira nusxalar:\n" + "\n".join(backups) +
+            "\n\nTiklash uchun: /restore <nom>"
+        )
+        return
+    
+    try:
+        name = await restore_backup(context.args[0])
+    except Exception as e:
+        logger.error(f"Error while restoring backup: {e}")
+        await update.message.reply_text(f"Tiklashda xatolik: {e}")
+        return
+    
+    await update.message.reply_text(f"✅ {name} dan tiklandi.")
+
 async def start_add_anime(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the process of adding a new anime."""
     query = update.callback_query
     
-    await query.edit_message_text(
+    await edit_message(query,
         "Yangi anime qo'shish.\n\nAnime nomini kiriting:",
         parse_mode=ParseMode.HTML
     )
@@ -79,6 +184,37 @@ async def add_anime_description(update: Update, context: ContextTypes.DEFAULT_TY
     """Process anime description input."""
     context.user_data["anime_description"] = update.message.text.strip()
     
+    await update.message.reply_text(
+        "Janrlarini vergul bilan kiriting (masalan: Jangari, Romantika) yoki '-':",
+        parse_mode=ParseMode.HTML
+    )
+    
+    return ANIME_GENRES
+
+async def add_anime_genres(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Process anime genres input."""
+    text = update.message.text.strip()
+    context.user_data["anime_genres"] = [] if text == "-" else parse_genres(text)
+    
+    await update.message.reply_text(
+        "Anime tugallanganmi? (ha/yo'q):",
+        parse_mode=ParseMode.HTML
+    )
+    
+    return ANIME_STATUS
+
+async def add_anime_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Process anime completed status input."""
+    answer = update.message.text.strip().lower()
+    if answer not in ("ha", "yo'q", "yoq"):
+        await update.message.reply_text(
+            "Iltimos, 'ha' yoki 'yo'q' deb javob bering:",
+            parse_mode=ParseMode.HTML
+        )
+        return ANIME_STATUS
+    
+    context.user_data["anime_completed"] = answer == "ha"
+    
     await update.message.reply_text(
         "Anime kodini kiriting (masalan: naruto, onepiece):",
         parse_mode=ParseMode.HTML
@@ -132,6 +268,26 @@ async def add_anime_video(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return ANIME_VIDEO
     
+    await update.message.reply_text(
+        "Chiqish vaqtini kiriting (YYYY-MM-DD HH:MM) yoki hozir chiqarish uchun '-' kiriting:",
+        parse_mode=ParseMode.HTML
+    )
+    
+    return ANIME_RELEASE
+
+async def add_anime_release(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Process the release time input and save the anime."""
+    release_at = None
+    if update.message.text.strip() != "-":
+        try:
+            release_at = parse_release_time(update.message.text)
+        except ValueError:
+            await update.message.reply_text(
+                "Noto'g'ri vaqt. Masalan: 2025-01-31 18:00 yoki '-':",
+                parse_mode=ParseMode.HTML
+            )
+            return ANIME_RELEASE
+    
     # Generate a new anime ID
     anime_id = generate_anime_id()
     
@@ -143,9 +299,13 @@ async def add_anime_video(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         "code": context.user_data["anime_code"],
         "image_id": context.user_data["anime_image_id"],
         "video_id": context.user_data.get("anime_video_id", ""),
+        "genres": context.user_data.get("anime_genres", []),
+        "completed": context.user_data.get("anime_completed", False),
         "vip": False,
         "episodes": []
     }
+    if release_at is not None:
+        new_anime["release_at"] = release_at
     
     # Save to data
     add_anime_to_db(new_anime)
@@ -160,8 +320,12 @@ async def add_anime_video(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
+    message = f"Anime muvaffaqiyatli qo'shildi!\nID: {anime_id}"
+    if "release_at" in new_anime:
+        message += f"\nChiqish vaqti: {format_release_time(release_at)}"
+    
     await update.message.reply_text(
-        f"Anime muvaffaqiyatli qo'shildi!\nID: {anime_id}",
+        message,
         reply_markup=reply_markup,
         parse_mode=ParseMode.HTML
     )
@@ -177,7 +341,7 @@ async def show_delete_anime_list(update: Update, context: ContextTypes.DEFAULT_T
         keyboard = [[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(
+        await edit_message(query,
             "Animelar ro'yxati bo'sh.",
             reply_markup=reply_markup
         )
@@ -190,7 +354,7 @@ async def show_delete_anime_list(update: Update, context: ContextTypes.DEFAULT_T
     keyboard.append([InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await query.edit_message_text(
+    await edit_message(query,
         "O'chirish uchun animeni tanlang:",
         reply_markup=reply_markup
     )
@@ -205,7 +369,7 @@ async def delete_anime(update: Update, context: ContextTypes.DEFAULT_TYPE, anime
     keyboard = [[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await query.edit_message_text(
+    await edit_message(query,
         f"Anime muvaffaqiyatli o'chirildi!",
         reply_markup=reply_markup
     )
@@ -219,7 +383,7 @@ async def show_add_episode_list(update: Update, context: ContextTypes.DEFAULT_TY
         keyboard = [[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(
+        await edit_message(query,
             "Animelar ro'yxati bo'sh.",
             reply_markup=reply_markup
         )
@@ -227,28 +391,62 @@ async def show_add_episode_list(update: Update, context: ContextTypes.DEFAULT_TY
     
     keyboard = []
     for anime in data["animes"]:
-        keyboard.append([InlineKeyboardButton(f"{anime['name']} ({anime['id']})", callback_data=f"add_episode_to_{anime['id']}")])
+        # The second button marks the anime as completed or ongoing
+        status = "🏁" if anime.get("completed", False) else "⏳"
+        keyboard.append([
+            InlineKeyboardButton(f"{anime['name']} ({anime['id']})", callback_data=f"add_episode_to_{anime['id']}"),
+            InlineKeyboardButton(status, callback_data=f"toggle_completed_{anime['id']}")
+        ])
     
     keyboard.append([InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await query.edit_message_text(
-        "Epizod qo'shish uchun animeni tanlang:",
+    await edit_message(query,
+        "Epizod qo'shish uchun animeni tanlang (🏁 tugallangan, ⏳ davom etmoqda):",
         reply_markup=reply_markup
     )
 
+async def toggle_completed_status(update: Update, context: ContextTypes.DEFAULT_TYPE, anime_id: str) -> None:
+    """Toggle the completed status of an anime."""
+    toggle_anime_completed(anime_id)
+    
+    # Show the updated list
+    await show_add_episode_list(update, context)
+
+async def start_add_episode(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Start adding an episode to the anime of the pressed button."""
+    query = update.callback_query
+    await query.answer()
+    
+    if not is_admin(query.from_user.id):
+        await edit_message(query, "Sizda admin huquqlari yo'q!")
+        return ConversationHandler.END
+    
+    context.user_data["current_anime_id"] = query.data.split("_")[3]
+    
+    await edit_message(query,
+        "Yangi epizod raqamini kiriting.\n"
+        "Keyinroq chiqarish uchun vaqtini ham yozing (masalan: 5 2025-01-31 18:00):",
+        parse_mode=ParseMode.HTML
+    )
+    
+    return ANIME_EPISODE_NUMBER
+
 async def add_episode_number(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Process episode number input."""
-    # Agar user_data bo'sh bo'lsa, demak bu tugma orqali emas, to'g'ridan-to'g'ri xabar orqali kelgan
+    # user_data may have been cleared by /cancel in another conversation
     if not context.user_data.get("current_anime_id"):
         return ConversationHandler.END
     
     try:
-        episode_number = int(update.message.text.strip())
+        # "5" publishes on upload, "5 2025-01-31 18:00" schedules the release
+        parts = update.message.text.strip().split(maxsplit=1)
+        episode_number = int(parts[0])
         if episode_number <= 0:
             raise ValueError("Episode number must be positive")
         
         context.user_data["episode_number"] = episode_number
+        context.user_data["episode_release_at"] = parse_release_time(parts[1]) if len(parts) > 1 else None
         
         await update.message.reply_text(
             "Epizod videosini yuklang:",
@@ -258,14 +456,27 @@ async def add_episode_number(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return ANIME_EPISODE_URL
     except ValueError:
         await update.message.reply_text(
-            "Noto'g'ri raqam. Iltimos, musbat son kiriting:",
+            "Noto'g'ri qiymat. Epizod raqamini kiriting, ixtiyoriy chiqish vaqti bilan "
+            "(masalan: 5 yoki 5 2025-01-31 18:00):",
             parse_mode=ParseMode.HTML
         )
         return ANIME_EPISODE_NUMBER
 
+async def add_episode_timeout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """End an episode upload left unfinished for EPISODE_UPLOAD_TIMEOUT."""
+    uploading = context.user_data.pop("current_anime_id", None) is not None
+    for key in ("episode_number", "episode_release_at"):
+        context.user_data.pop(key, None)
+    # Not after a search started from the upload; that one just ends quietly
+    if uploading and update.effective_chat:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="Epizod qo'shish vaqti tugadi. Qaytadan boshlang.",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Admin panelga qaytish", callback_data="back_to_admin")]])
+        )
+
 async def add_episode_url(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Process episode video input and save the episode."""
-    # Agar user_data bo'sh bo'lsa, demak bu tugma orqali emas, to'g'ridan-to'g'ri xabar orqali kelgan
     if not context.user_data.get("current_anime_id") or not context.user_data.get("episode_number"):
         return ConversationHandler.END
     
@@ -279,9 +490,10 @@ async def add_episode_url(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     video_id = update.message.video.file_id
     anime_id = context.user_data["current_anime_id"]
     episode_number = context.user_data["episode_number"]
+    release_at = context.user_data.get("episode_release_at")
     
     # Add episode to anime
-    add_episode_to_anime(anime_id, episode_number, video_id)
+    add_episode_to_anime(anime_id, episode_number, video_id, release_at)
     
     # Clear user data
     context.user_data.clear()
@@ -292,49 +504,143 @@ async def add_episode_url(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
+    message = "Epizod muvaffaqiyatli qo'shildi!"
+    if release_at is not None and release_at > time.time():
+        message += f"\nChiqish vaqti: {format_release_time(release_at)}"
+    
     await update.message.reply_text(
-        f"Epizod muvaffaqiyatli qo'shildi!",
+        message,
         reply_markup=reply_markup,
         parse_mode=ParseMode.HTML
     )
     
     return ConversationHandler.END
 
-async def show_manage_vip(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+async def show_statistics(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show the admin dashboard; every number is a maintained counter."""
+    query = update.callback_query
+    stats = get_stats()
+    today = stats.day()
+    
+    users = count_users()
+    animes = count_animes()
+    episodes = stats.totals[EPISODES]
+    
+    lines = [
+        "📊 <b>Statistika</b>",
+        "",
+        f"👥 Foydalanuvchilar: {users} (bugun +{today[SIGNUPS]})",
+        f"👑 VIP: {count_vip_users()} (bugun +{today[VIP_ADDED]} / -{today[VIP_REMOVED]})",
+        f"📺 Animelar: {animes} (bugun +{today[ANIMES_ADDED]} / -{today[ANIMES_DELETED]})",
+        f"🎬 Epizodlar: {episodes} (bugun +{today[EPISODES_ADDED]}), "
+        f"o'rtacha {episodes / animes if animes else 0:.1f} ta / anime",
+        "",
+        "📅 <b>Oxirgi 7 kun:</b>",
+    ]
+    for day, counts in stats.recent_days(7):
+        lines.append(f"{day}: 👥 +{counts[SIGNUPS]}  📺 +{counts[ANIMES_ADDED]}  🎬 +{counts[EPISODES_ADDED]}")
+    
+    flood = get_flood_stats()
+    edit_stats = get_edit_stats()
+    gateway = get_gateway_stats()
+    notify = get_notify_stats()
+    lines += [
+        "",
+        "⚙️ <b>Bot:</b>",
+        f"Anti-flood: {flood.get('throttled', 0)} cheklangan, {flood.get('coalesced', 0)} birlashtirilgan",
+        f"Tahrirlar: {edit_stats.get('full', 0)} to'liq, {edit_stats.get('skipped', 0)} o'tkazib yuborilgan",
+        f"Obunalar: {count_subscriptions()}, xabarnomalar: {notify.get('sent', 0)} yuborilgan, "
+        f"{notify.get('queued', 0)} navbatda",
+    ]
+    if gateway:
+        queued = sum(lane["queued"] for lane in gateway["lanes"].values())
+        lines.append(f"Navbatda: {queued} so'rov, {gateway['retries']} qayta urinish")
+    
+    keyboard = [
+        [InlineKeyboardButton("🔄 Yangilash", callback_data="statistics")],
+        [InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")]
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await edit_message(query,
+        "\n".join(lines),
+        parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup
+    )
+
+async def show_scheduled_releases(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show pending scheduled releases."""
+    query = update.callback_query
+    releases = pending_releases()
+    
+    if releases:
+        lines = []
+        for release_at, anime_id, episode_number in releases:
+            anime = get_anime_by_id(anime_id)
+            name = anime["name"] if anime else anime_id
+            what = f"{name} - {episode_number}-qism" if episode_number is not None else name
+            lines.append(f"{format_release_time(release_at)} - {what}")
+        message = "Rejalashtirilgan chiqishlar:\n\n" + "\n".join(lines)
+    else:
+        message = "Rejalashtirilgan chiqishlar yo'q."
+    
+    keyboard = [[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")]]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await edit_message(query,
+        message,
+        reply_markup=reply_markup
+    )
+
+async def show_manage_vip(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 1) -> None:
     """Show VIP management panel."""
     query = update.callback_query
-    users = load_users()
+    total = count_users()
     
-    if not users["users"]:
+    if not total:
         keyboard = [[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await query.edit_message_text(
+        await edit_message(query,
             "Foydalanuvchilar ro'yxati bo'sh.",
             reply_markup=reply_markup
         )
         return
     
+    # Only one page of users is built, whatever the user count
+    items_per_page = 20
+    total_pages = (total + items_per_page - 1) // items_per_page
+    page = max(1, min(page, total_pages))
+    
     keyboard = []
-    for user in users["users"]:
-        status = "✅ VIP" if user.get("vip", False) else "❌ Oddiy"
-        name = user.get("first_name", "Foydalanuvchi")
-        keyboard.append([InlineKeyboardButton(f"{name} - {status}", callback_data=f"toggle_vip_{user['id']}")])
+    for user in list_users((page - 1) * items_per_page, items_per_page):
+        status = "✅ VIP" if user["vip"] else "❌ Oddiy"
+        name = user["first_name"] or "Foydalanuvchi"
+        keyboard.append([InlineKeyboardButton(f"{name} - {status}", callback_data=f"toggle_vip_{user['id']}_{page}")])
+    
+    pagination = []
+    if page > 1:
+        pagination.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=f"vip_page_{page-1}"))
+    if page < total_pages:
+        pagination.append(InlineKeyboardButton("Keyingi ➡️", callback_data=f"vip_page_{page+1}"))
+    if pagination:
+        keyboard.append(pagination)
     
     keyboard.append([InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_admin")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await query.edit_message_text(
-        "VIP statusini o'zgartirish uchun foydalanuvchini tanlang:",
+    await edit_message(query,
+        f"VIP statusini o'zgartirish uchun foydalanuvchini tanlang:\n"
+        f"👥 Jami: {total}, 👑 VIP: {count_vip_users()} (sahifa {page}/{total_pages})",
         reply_markup=reply_markup
     )
 
-async def toggle_vip_status(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int) -> None:
+async def toggle_vip_status(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id: int, page: int = 1) -> None:
     """Toggle VIP status for a user."""
     query = update.callback_query
     
     # Toggle VIP status
-    toggle_user_vip(user_id)
+    await toggle_user_vip(user_id)
     
     # Show updated VIP management panel
-    await show_manage_vip(update, context)
\ No newline at end of file
+    await show_manage_vip(update, context, page)
\ No newline at end of file
@@ -0,0 +1,94 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+from config import FLOOD_RATE, FLOOD_BURST, FLOOD_MAX_USERS, FLOOD_DUPLICATE_WINDOW
+from database import is_admin
+
+logger = logging.getLogger(__name__)
+
+class UserBucket:
+    """Token bucket plus the last callback seen for one user."""
+    __slots__ = ("tokens", "updated", "last_data", "last_data_time")
+
+    def __init__(self, now):
+        self.tokens = FLOOD_BURST
+        self.updated = now
+        self.last_data = None
+        self.last_data_time = 0.0
+
+    def take(self, now):
+        # Refill lazily based on the time since the last update
+        self.tokens = min(FLOOD_BURST, self.tokens + (now - self.updated) * FLOOD_RATE)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+# user_id -> UserBucket, least recently seen first
+_buckets = OrderedDict()
+
+# Throttling counters: "passed", "throttled", "coalesced", plus per update kind
+flood_stats = Counter()
+
+def _get_bucket(user_id, now):
+    bucket = _buckets.get(user_id)
+    if bucket is None:
+        bucket = _buckets[user_id] = UserBucket(now)
+        # Evict the least recently seen users to keep memory bounded
+        while len(_buckets) > FLOOD_MAX_USERS:
+            _buckets.popitem(last=False)
+    else:
+        _buckets.move_to_end(user_id)
+    return bucket
+
+def check_flood(user_id, callback_data=None, now=None):
+    """Return None if the update may pass, else "throttled" or "coalesced"."""
+    if now is None:
+        now = time.monotonic()
+    bucket = _get_bucket(user_id, now)
+
+    # The same button pressed again in quick succession is a duplicate
+    if callback_data is not None:
+        # The window runs from the first press, so tapping on does not extend it
+        if callback_data == bucket.last_data and now - bucket.last_data_time < FLOOD_DUPLICATE_WINDOW:
+            return "coalesced"
+        bucket.last_data = callback_data
+        bucket.last_data_time = now
+
+    if not bucket.take(now):
+        return "throttled"
+    return None
+
+def get_flood_stats():
+    """Return a copy of the throttling counters."""
+    return {**flood_stats, "tracked_users": len(_buckets)}
+
+async def antiflood_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Drop excess updates before they reach the real handlers (group -1)."""
+    user = update.effective_user
+    if user is None or is_admin(user.id):
+        return
+
+    query = update.callback_query
+    verdict = check_flood(user.id, query.data if query else None)
+
+    if verdict is None:
+        flood_stats["passed"] += 1
+        return
+
+    kind = "callback" if query else "message"
+    flood_stats[verdict] += 1
+    flood_stats[f"{verdict}_{kind}"] += 1
+
+    if query:
+        # Stop the button spinner; far cheaper than the handler it replaces.
+        # A duplicate press gets an empty answer, the first one is being handled.
+        try:
+            await query.answer("⏳ Iltimos, sekinroq." if verdict == "throttled" else None)
+        except Exception as e:
+            logger.debug(f"Could not answer {verdict} callback: {e}")
+
+    raise ApplicationHandlerStop
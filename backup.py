@@ -0,0 +1,149 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from config import (
+    BACKUP_DIR, BACKUP_KEEP, BACKUP_COMPRESSION_LEVEL, VIEWS_FILE, PROGRESS_FILE, RELEASES_FILE, STATS_FILE,
+    SUBSCRIPTIONS_FILE, FEED_FILE
+)
+from storage import file_lock, write_json_atomic
+from database import catalog_store, user_store
+from users import pack_snapshot
+from views import view_counters, load_views
+from progress import progress_store, load_progress
+from stats import stats_counters, load_stats
+from subscriptions import subscription_store, load_subscriptions
+from feed import release_feed, load_feed
+import scheduler
+
+logger = logging.getLogger(__name__)
+
+BACKUP_PREFIX = "backup-"
+BACKUP_SUFFIX = ".json.gz"
+
+# Only one backup or restore at a time
+_backup_lock = asyncio.Lock()
+
+def _snapshot():
+    """Copy the current in-memory state, without serializing it.
+
+    Runs on the event loop without awaiting, so no handler can change
+    anything halfway through: the result is a consistent point in time.
+    Only what handlers change in place is copied (user columns as raw
+    bytes), so this is cheap; _write_backup does the expensive work in a
+    thread.
+    """
+    return {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "files": {
+            catalog_store.path: catalog_store.snapshot(),
+            user_store.path: user_store.snapshot(),
+            "views": view_counters.to_dict(),
+            "progress": progress_store.to_dict(),
+            "stats": stats_counters.to_dict(),
+            "subscriptions": subscription_store.to_dict(),
+            FEED_FILE: release_feed.entries(),
+            RELEASES_FILE: list(scheduler.release_heap),
+        },
+    }
+
+def _write_backup(bundle):
+    """Serialize, compress and write a snapshot (in a thread). Returns (name, raw size, size)."""
+    files = bundle["files"]
+    files[user_store.path] = pack_snapshot(files[user_store.path])
+    raw = json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d-%H%M%S')}{BACKUP_SUFFIX}"
+    path = os.path.join(BACKUP_DIR, name)
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=BACKUP_COMPRESSION_LEVEL) as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+    _rotate()
+    return name, len(raw), os.path.getsize(path)
+
+def _rotate():
+    """Delete all but the newest BACKUP_KEEP backups."""
+    for name in list_backups()[BACKUP_KEEP:]:
+        os.remove(os.path.join(BACKUP_DIR, name))
+
+def list_backups():
+    """Backup file names, newest first."""
+    try:
+        names = os.listdir(BACKUP_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted((n for n in names if n.startswith(BACKUP_PREFIX) and n.endswith(BACKUP_SUFFIX)), reverse=True)
+
+async def create_backup():
+    """Take a snapshot and write it compressed. Returns a report dict."""
+    async with _backup_lock:
+        started = time.perf_counter()
+        bundle = _snapshot()
+        snapshot_time = time.perf_counter() - started
+
+        name, raw_size, size = await asyncio.to_thread(_write_backup, bundle)
+        duration = time.perf_counter() - started
+
+    report = {
+        "name": name,
+        "raw_size": raw_size,
+        "size": size,
+        "snapshot_ms": snapshot_time * 1000,
+        "duration_ms": duration * 1000,
+    }
+    logger.info(
+        f"Backup {name}: {size} bytes ({raw_size} raw), "
+        f"snapshot {report['snapshot_ms']:.1f} ms, total {report['duration_ms']:.1f} ms"
+    )
+    return report
+
+async def backup_job(context=None) -> None:
+    """Periodic backup (JobQueue callback)."""
+    try:
+        await create_backup()
+    except Exception as e:
+        logger.error(f"Backup failed: {e}")
+
+def _read_backup(name):
+    if os.path.basename(name) != name or not name.startswith(BACKUP_PREFIX):
+        raise ValueError(f"Invalid backup name: {name}")
+    with gzip.open(os.path.join(BACKUP_DIR, name), "rb") as f:
+        return json.loads(f.read())
+
+async def restore_backup(name=None):
+    """Replace the live state with a backup (the newest one by default). Returns its name."""
+    async with _backup_lock:
+        if name is None:
+            backups = list_backups()
+            if not backups:
+                raise FileNotFoundError("No backups")
+            name = backups[0]
+        bundle = await asyncio.to_thread(_read_backup, name)
+        files = bundle["files"]
+
+        # Stores notify other processes themselves
+        catalog_store.replace_all(files[catalog_store.path])
+        user_store.replace_all(files[user_store.path])
+
+        for path, key in ((VIEWS_FILE, "views"), (PROGRESS_FILE, "progress"), (RELEASES_FILE, RELEASES_FILE), (STATS_FILE, "stats"),
+                          (SUBSCRIPTIONS_FILE, "subscriptions"), (FEED_FILE, FEED_FILE)):
+            # Backups from before a file existed leave it as it is
+            if key not in files:
+                continue
+            with file_lock(path):
+                write_json_atomic(path, files[key])
+        # Counters and progress recorded since the backup are dropped with the rest
+        load_views()
+        load_progress()
+        load_stats()
+        load_subscriptions()
+        load_feed()
+        scheduler.init_scheduler(scheduler._job_queue)
+
+    logger.info(f"Restored backup {name} from {bundle['created']}")
+    return name
@@ -1,41 +1,71 @@
 import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import (
-    Application, CommandHandler, CallbackQueryHandler, 
-    MessageHandler, filters, ContextTypes, ConversationHandler
+    Application, ApplicationBuilder, CommandHandler, CallbackQueryHandler, 
+    MessageHandler, TypeHandler, filters, ContextTypes, ConversationHandler
 )
-from telegram.constants import ParseMode
+from edits import edit_message
 
 # Import configuration
 from config import (
-    BOT_TOKEN, ANIME_NAME, ANIME_DESCRIPTION, ANIME_CODE, 
+    BOT_TOKEN, ADMIN_IDS, ANIME_NAME, ANIME_DESCRIPTION, ANIME_CODE, 
     ANIME_IMAGE, ANIME_VIDEO, ANIME_EPISODE_NUMBER, 
-    ANIME_EPISODE_URL, SEARCH_QUERY
+    ANIME_EPISODE_URL, SEARCH_QUERY, ANIME_RELEASE, ANIME_GENRES, ANIME_STATUS, VIEWS_FLUSH_INTERVAL,
+    PROGRESS_FLUSH_INTERVAL, USERS_FLUSH_INTERVAL, BACKUP_INTERVAL, STATS_FLUSH_INTERVAL,
+    RECORD_UPDATES, SUBSCRIPTIONS_FLUSH_INTERVAL, EPISODE_UPLOAD_TIMEOUT
 )
 
 # Import handlers
 from handlers import (
     start, help_command, search_anime_command, search_anime_query,
-    list_animes, list_animes_command, show_anime_details, 
-    show_episode, vip_info, vip_command, cancel_conversation
+    list_animes, list_animes_command, show_anime_details, toggle_subscribe,
+    show_episode, show_latest, show_trending, show_browse, browse_action, resume_watching, main_menu_keyboard, vip_info, vip_command, cancel_conversation
 )
 
 # Import admin functions
 from admin import (
-    admin_panel, admin_command, start_add_anime, add_anime_name,
-    add_anime_description, add_anime_code, add_anime_image, 
-    add_anime_video, show_delete_anime_list, delete_anime,
-    show_add_episode_list, add_episode_number, add_episode_url,
-    show_manage_vip, toggle_vip_status
+    admin_panel, admin_command, profile_command, memprofile_command, backup_command, restore_command, start_add_anime, add_anime_name,
+    add_anime_description, add_anime_genres, add_anime_status, add_anime_code, add_anime_image, 
+    add_anime_video, add_anime_release, show_delete_anime_list, delete_anime,
+    show_add_episode_list, toggle_completed_status, start_add_episode, add_episode_number, add_episode_url,
+    add_episode_timeout,
+    show_manage_vip, toggle_vip_status, show_scheduled_releases, show_statistics
 )
 
 # Import database functions
-from database import is_admin
+from database import is_admin, flush_users
+
+# Import anti-flood middleware
+from antiflood import antiflood_handler
+
+# Import outbound gateway
+from gateway import configure_builder
+
+# Import view counters
+from views import load_views, flush_views
+
+# Import watch progress store
+from progress import load_progress, flush_progress
+
+# Import release scheduler
+from scheduler import init_scheduler
+
+# Import admin statistics
+from stats import load_stats, flush_stats
+
+# Import subscriptions and the episode notifier
+from subscriptions import load_subscriptions, flush_subscriptions
+from notifier import episode_notifier
+
+# Import backups
+from backup import backup_job
+
+# Import logging setup
+from logs import setup_logging, tag_handlers
+
+# Import update recording
+from recorder import update_recorder, record_update
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 async def button_click(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -47,13 +77,29 @@ async def button_click(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         await search_anime_command(update, context)
     elif query.data == "anime_list":
         await list_animes(update, context)
+    elif query.data == "resume":
+        await resume_watching(update, context)
+    elif query.data == "latest":
+        await show_latest(update, context)
+    elif query.data.startswith("latest_page_"):
+        page = int(query.data.split("_")[2])
+        await show_latest(update, context, page)
+    elif query.data == "trending":
+        await show_trending(update, context)
+    elif query.data == "browse":
+        await show_browse(update, context)
+    elif query.data.startswith("browse_"):
+        await browse_action(update, context, query.data)
     elif query.data == "vip_info":
         await vip_info(update, context)
     elif query.data == "admin_panel":
         if is_admin(query.from_user.id):
             await admin_panel(update, context)
         else:
-            await query.edit_message_text("Sizda admin huquqlari yo'q!")
+            await edit_message(query, "Sizda admin huquqlari yo'q!")
+    elif query.data.startswith("subscribe_"):
+        anime_id = query.data.split("_")[1]
+        await toggle_subscribe(update, context, anime_id)
     elif query.data.startswith("anime_"):
         anime_id = query.data.split("_")[1]
         await show_anime_details(update, context, anime_id)
@@ -75,35 +121,33 @@ async def button_click(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     elif query.data == "add_episode":
         if is_admin(query.from_user.id):
             await show_add_episode_list(update, context)
-    elif query.data.startswith("add_episode_to_"):
+    elif query.data.startswith("toggle_completed_"):
+        if is_admin(query.from_user.id):
+            anime_id = query.data.split("_")[2]
+            await toggle_completed_status(update, context, anime_id)
+    elif query.data == "statistics":
+        if is_admin(query.from_user.id):
+            await show_statistics(update, context)
+    elif query.data == "scheduled_releases":
         if is_admin(query.from_user.id):
-            anime_id = query.data.split("_")[3]
-            context.user_data["current_anime_id"] = anime_id
-            await query.edit_message_text(
-                "Yangi epizod raqamini kiriting:",
-                parse_mode=ParseMode.HTML
-            )
-            return ANIME_EPISODE_NUMBER
+            await show_scheduled_releases(update, context)
     elif query.data == "manage_vip":
         if is_admin(query.from_user.id):
             await show_manage_vip(update, context)
+    elif query.data.startswith("vip_page_"):
+        if is_admin(query.from_user.id):
+            page = int(query.data.split("_")[2])
+            await show_manage_vip(update, context, page)
     elif query.data.startswith("toggle_vip_"):
         if is_admin(query.from_user.id):
-            user_id = int(query.data.split("_")[2])
-            await toggle_vip_status(update, context, user_id)
+            parts = query.data.split("_")
+            user_id = int(parts[2])
+            page = int(parts[3]) if len(parts) > 3 else 1
+            await toggle_vip_status(update, context, user_id, page)
     elif query.data == "back_to_main":
-        keyboard = [
-            [InlineKeyboardButton("🔍 Anime qidirish", callback_data="search")],
-            [InlineKeyboardButton("📋 Animelar ro'yxati", callback_data="anime_list")],
-            [InlineKeyboardButton("👑 VIP", callback_data="vip_info")]
-        ]
-        
-        if is_admin(query.from_user.id):
-            keyboard.append([InlineKeyboardButton("⚙️ Admin panel", callback_data="admin_panel")])
+        reply_markup = main_menu_keyboard(query.from_user.id)
         
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
+        await edit_message(query,
             f"Assalomu alaykum, {query.from_user.first_name}! Anime ko'rish botiga xush kelibsiz!",
             reply_markup=reply_markup
         )
@@ -113,24 +157,78 @@ async def button_click(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         page = int(query.data.split("_")[1])
         await list_animes(update, context, page)
 
-def main() -> None:
-    """Start the bot."""
-    # Create the Application
-    application = Application.builder().token(BOT_TOKEN).build()
+async def post_init(application: Application) -> None:
+    """Load persisted state and start periodic jobs."""
+    load_views()
+    application.job_queue.run_repeating(flush_views, interval=VIEWS_FLUSH_INTERVAL, first=VIEWS_FLUSH_INTERVAL)
+    load_progress()
+    application.job_queue.run_repeating(flush_progress, interval=PROGRESS_FLUSH_INTERVAL, first=PROGRESS_FLUSH_INTERVAL)
+    load_stats()
+    application.job_queue.run_repeating(flush_stats, interval=STATS_FLUSH_INTERVAL, first=STATS_FLUSH_INTERVAL)
+    application.job_queue.run_repeating(flush_users, interval=USERS_FLUSH_INTERVAL, first=USERS_FLUSH_INTERVAL)
+    load_subscriptions()
+    application.job_queue.run_repeating(
+        flush_subscriptions, interval=SUBSCRIPTIONS_FLUSH_INTERVAL, first=SUBSCRIPTIONS_FLUSH_INTERVAL
+    )
+    init_scheduler(application.job_queue)
+    application.job_queue.run_repeating(backup_job, interval=BACKUP_INTERVAL, first=BACKUP_INTERVAL, name="backup")
+
+async def post_shutdown(application: Application) -> None:
+    """Flush in-memory state before exiting."""
+    await flush_views()
+    await flush_progress()
+    await flush_users()
+    await flush_stats()
+    await flush_subscriptions()
+    await episode_notifier.stop()
+    update_recorder.stop()
+
+async def leave_add_episode(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """End the episode upload when the admin presses another button, then handle the press."""
+    for key in ("current_anime_id", "episode_number", "episode_release_at"):
+        context.user_data.pop(key, None)
+    await button_click(update, context)
+    return ConversationHandler.END
+
+async def search_from_add_episode(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """End the episode upload and start a search, which runs on in the upload conversation."""
+    for key in ("current_anime_id", "episode_number", "episode_release_at"):
+        context.user_data.pop(key, None)
+    return await search_anime_command(update, context)
+
+def build_application(builder: ApplicationBuilder = None, record_updates: bool = RECORD_UPDATES) -> Application:
+    """Create the Application with all handlers registered."""
+    if builder is None:
+        builder = Application.builder().token(BOT_TOKEN)
+    
+    # Create the Application with the pooled client and priority rate limiter
+    builder = builder.post_init(post_init).post_shutdown(post_shutdown)
+    application = configure_builder(builder).build()
     
     # Set bot instance for database module
     from database import set_bot
     set_bot(application.bot)
     
+    # The recorder sees every update, including the ones anti-flood drops
+    if record_updates:
+        update_recorder.start()
+        application.add_handler(TypeHandler(Update, record_update), group=-2)
+    
+    # Anti-flood runs before every other handler group
+    application.add_handler(TypeHandler(Update, antiflood_handler), group=-1)
+    
     # Add conversation handlers
     add_anime_conv_handler = ConversationHandler(
         entry_points=[CallbackQueryHandler(start_add_anime, pattern="^add_anime$")],
         states={
             ANIME_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_anime_name)],
             ANIME_DESCRIPTION: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_anime_description)],
+            ANIME_GENRES: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_anime_genres)],
+            ANIME_STATUS: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_anime_status)],
             ANIME_CODE: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_anime_code)],
             ANIME_IMAGE: [MessageHandler(filters.PHOTO | filters.TEXT, add_anime_image)],
             ANIME_VIDEO: [MessageHandler(filters.VIDEO | filters.TEXT, add_anime_video)],
+            ANIME_RELEASE: [MessageHandler(filters.TEXT & ~filters.COMMAND, add_anime_release)],
         },
         fallbacks=[CommandHandler("cancel", cancel_conversation)],
         per_message=False
@@ -149,28 +247,60 @@ def main() -> None:
         per_message=False
     )
     
-    # Epizod qo'shish uchun handler
-    episode_handler = MessageHandler(filters.TEXT & ~filters.COMMAND, add_episode_number)
-    application.add_handler(episode_handler, group=1)
-    
-    # Video qo'shish uchun handler
-    video_handler = MessageHandler(filters.VIDEO, add_episode_url)
-    application.add_handler(video_handler, group=2)
+    # Episode upload: only admins can be in it, and their messages are the only
+    # ones the state handlers accept, so other users' messages skip it at once.
+    # Pressing any other button or leaving it idle ends it, so an abandoned
+    # upload does not keep swallowing the admin's messages.
+    admin_only = filters.User(user_id=ADMIN_IDS)
+    add_episode_conv_handler = ConversationHandler(
+        entry_points=[CallbackQueryHandler(start_add_episode, pattern="^add_episode_to_")],
+        states={
+            ANIME_EPISODE_NUMBER: [MessageHandler(admin_only & filters.TEXT & ~filters.COMMAND, add_episode_number)],
+            ANIME_EPISODE_URL: [MessageHandler(admin_only & (filters.VIDEO | (filters.TEXT & ~filters.COMMAND)), add_episode_url)],
+            # Left through the search button: the search conversation never saw its start
+            SEARCH_QUERY: [MessageHandler(filters.TEXT & ~filters.COMMAND, search_anime_query)],
+            ConversationHandler.TIMEOUT: [TypeHandler(Update, add_episode_timeout)],
+        },
+        fallbacks=[
+            CommandHandler("cancel", cancel_conversation),
+            CallbackQueryHandler(search_from_add_episode, pattern="^search$"),
+            CommandHandler("search", search_from_add_episode),
+            CallbackQueryHandler(leave_add_episode),
+        ],
+        per_message=False,
+        allow_reentry=True,
+        conversation_timeout=EPISODE_UPLOAD_TIMEOUT
+    )
     
     # Add command handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("list", list_animes_command))
     application.add_handler(CommandHandler("admin", admin_command))
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("memprofile", memprofile_command))
+    application.add_handler(CommandHandler("backup", backup_command))
+    application.add_handler(CommandHandler("restore", restore_command))
     application.add_handler(CommandHandler("vip", vip_command))
     
     # Add conversation handlers
     application.add_handler(add_anime_conv_handler)
+    application.add_handler(add_episode_conv_handler)
     application.add_handler(search_conv_handler)
     
     # Add callback query handler for button clicks
     application.add_handler(CallbackQueryHandler(button_click))
     
+    # Log records made inside a handler carry its update id, user id and name
+    tag_handlers(application)
+    
+    return application
+
+def main() -> None:
+    """Start the bot."""
+    setup_logging()
+    application = build_application()
+    
     # Run the bot until the user presses Ctrl-C
     application.run_polling()
 
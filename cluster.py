@@ -0,0 +1,231 @@
+"""Run the bot as several worker processes on one host.
+
+    python cluster.py --workers 4
+
+The parent process receives the webhook (put it behind an HTTPS reverse
+proxy pointing at WEBHOOK_LISTEN:WEBHOOK_PORT) and forwards every update to
+worker user_id % N over a Unix datagram socket, so a user's conversation
+state, anti-flood bucket and progress always live in the same worker.
+
+Workers share data.json through storage.CachedStore and users.json
+through users.UserTable. After each write a worker broadcasts the changed
+records on the same sockets and the other workers patch only those entries
+in their cache.
+"""
+import argparse
+import asyncio
+import errno
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telegram import Update
+from logs import setup_logging
+from config import (
+    BOT_TOKEN, CLUSTER_SOCKET_DIR, WEBHOOK_URL, WEBHOOK_LISTEN,
+    WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+)
+
+logger = logging.getLogger(__name__)
+
+def worker_socket_path(index):
+    return os.path.join(CLUSTER_SOCKET_DIR, f"worker-{index}.sock")
+
+def update_user_id(update):
+    """Find the user (or chat) an update belongs to."""
+    for value in update.values():
+        if isinstance(value, dict):
+            user = value.get("from") or value.get("user") or value.get("chat")
+            if isinstance(user, dict) and "id" in user:
+                return user["id"]
+    return 0
+
+class ClusterChannel:
+    """Unix datagram socket of one worker, used for updates and change notices."""
+
+    def __init__(self, index):
+        self.index = index
+        self.path = worker_socket_path(index)
+        os.makedirs(CLUSTER_SOCKET_DIR, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.path)
+        self.sock.setblocking(False)
+
+    def broadcast(self, store_name, message):
+        """Tell every other worker about a change to a shared store."""
+        payload = json.dumps({"type": "change", "store": store_name, **message}, ensure_ascii=False).encode("utf-8")
+        for path in glob.glob(os.path.join(CLUSTER_SOCKET_DIR, "worker-*.sock")):
+            if path == self.path:
+                continue
+            try:
+                self.sock.sendto(payload, path)
+            except OSError as e:
+                if e.errno == errno.EMSGSIZE:
+                    # Record too big for one datagram: ask for a reload instead
+                    small = {"type": "change", "store": store_name, "op": "reload", "version": message["version"]}
+                    self.sock.sendto(json.dumps(small).encode("utf-8"), path)
+                else:
+                    # Worker is gone or restarting; it reloads on start anyway
+                    logger.debug(f"Could not notify {path}: {e}")
+
+    def listen(self, on_message):
+        loop = asyncio.get_running_loop()
+
+        def read():
+            while True:
+                try:
+                    data = self.sock.recv(1 << 20)
+                except BlockingIOError:
+                    return
+                try:
+                    on_message(json.loads(data))
+                except Exception as e:
+                    logger.error(f"Error handling cluster message: {e}")
+
+        loop.add_reader(self.sock.fileno(), read)
+
+    def close(self):
+        self.sock.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+async def _worker_main(index):
+    # Imported here so each worker process builds its own state
+    from bot import build_application
+    from database import STORES
+    from storage import set_change_listener
+
+    application = build_application()
+    channel = ClusterChannel(index)
+    set_change_listener(channel.broadcast)
+
+    def on_message(message):
+        if message["type"] == "update":
+            application.update_queue.put_nowait(Update.de_json(message["update"], application.bot))
+        elif message["type"] == "change":
+            store = STORES.get(message["store"])
+            if store:
+                store.apply_remote(message)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    if index != 0:
+        # One process is enough to back up the shared files
+        for job in application.job_queue.get_jobs_by_name("backup"):
+            job.schedule_removal()
+    await application.start()
+    channel.listen(on_message)
+    logger.info(f"Worker {index} ready")
+
+    await stop.wait()
+
+    channel.close()
+    await application.stop()
+    if application.post_shutdown:
+        await application.post_shutdown(application)
+    await application.shutdown()
+
+def run_worker(index):
+    setup_logging()
+    asyncio.run(_worker_main(index))
+
+def set_webhook(workers):
+    params = {
+        "url": WEBHOOK_URL,
+        "secret_token": WEBHOOK_SECRET,
+        "max_connections": max(40, workers * 10),
+        "drop_pending_updates": "false",
+    }
+    request = urllib.request.Request(
+        f"https://api.telegram.org/bot{BOT_TOKEN}/setWebhook",
+        data=json.dumps(params).encode("utf-8"),
+        headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        logger.info(f"setWebhook: {response.read().decode('utf-8')}")
+
+def make_router(workers):
+    sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+
+    class Router(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            if self.path != f"/{WEBHOOK_PATH}":
+                return self._reply(404)
+            if WEBHOOK_SECRET and self.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+                return self._reply(403)
+
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                update = json.loads(body)
+            except ValueError:
+                return self._reply(400)
+
+            index = update_user_id(update) % workers
+            payload = json.dumps({"type": "update", "update": update}, ensure_ascii=False).encode("utf-8")
+            try:
+                sender.sendto(payload, worker_socket_path(index))
+            except OSError as e:
+                # Worker not up (yet); Telegram retries on a non-2xx answer
+                logger.warning(f"Worker {index} unavailable: {e}")
+                return self._reply(503)
+            self._reply(200)
+
+    return Router
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the bot as several webhook workers.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--no-set-webhook", action="store_true", help="do not call setWebhook on start")
+    args = parser.parse_args()
+    setup_logging()
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_worker, args=(i,), daemon=True) for i in range(args.workers)]
+    for process in processes:
+        process.start()
+
+    # Give workers a moment to bind their sockets before traffic arrives
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and not all(os.path.exists(worker_socket_path(i)) for i in range(args.workers)):
+        time.sleep(0.1)
+
+    if not args.no_set_webhook:
+        set_webhook(args.workers)
+
+    server = ThreadingHTTPServer((WEBHOOK_LISTEN, WEBHOOK_PORT), make_router(args.workers))
+    logger.info(f"Routing webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT} to {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+
+if __name__ == "__main__":
+    main()
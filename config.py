@@ -19,4 +19,101 @@ ANIME_IMAGE = 4
 ANIME_VIDEO = 5
 ANIME_EPISODE_NUMBER = 6
 ANIME_EPISODE_URL = 7
-SEARCH_QUERY = 8
\ No newline at end of file
+SEARCH_QUERY = 8
+ANIME_RELEASE = 9
+ANIME_GENRES = 10
+ANIME_STATUS = 11
+
+# An episode upload left unfinished this many seconds ends by itself
+EPISODE_UPLOAD_TIMEOUT = 10 * 60
+
+# Profiling (admin /profile and /memprofile commands)
+PROFILE_DEFAULT_SECONDS = 15
+PROFILE_MAX_SECONDS = 60
+PROFILE_TOP_ENTRIES = 40
+PROFILE_TRACEMALLOC_FRAMES = 1
+
+# Anti-flood (per-user token bucket in front of all handlers)
+FLOOD_RATE = 1.0  # tokens refilled per second
+FLOOD_BURST = 5  # bucket size
+FLOOD_MAX_USERS = 50000  # tracked users before the least recent are evicted
+FLOOD_DUPLICATE_WINDOW = 1.0  # seconds in which a repeated button press is dropped
+
+# Outbound Bot API gateway
+GATEWAY_GLOBAL_RATE = 30  # requests per second across all chats
+GATEWAY_GLOBAL_BURST = 30
+GATEWAY_GROUP_CHAT_INTERVAL = 3.0  # seconds between posts to one group or channel
+GATEWAY_MAX_RETRIES = 3  # retries after RetryAfter before giving up
+GATEWAY_POOL_SIZE = 64
+GATEWAY_POOL_TIMEOUT = 10.0
+GATEWAY_READ_TIMEOUT = 10.0
+GATEWAY_CONNECT_TIMEOUT = 5.0
+
+# View counters and trending
+VIEWS_FILE = "views.json"
+VIEWS_FLUSH_INTERVAL = 60  # seconds between writes of the view counters
+TRENDING_SIZE = 10  # entries in the trending list
+TRENDING_WINDOW = 7 * 24 * 3600  # sliding window in seconds
+TRENDING_BUCKET = 3600  # window granularity in seconds
+
+# Continue watching
+PROGRESS_FILE = "progress.json"
+PROGRESS_FLUSH_INTERVAL = 30  # seconds between batched progress writes
+
+# Users
+USERS_FLUSH_INTERVAL = 10  # seconds between batched writes of newly registered users
+
+# Shared storage cache
+CACHE_CHECK_INTERVAL = 1.0  # seconds between checks for changes made outside the bot
+
+# Multi-process webhook deployment (cluster.py)
+CLUSTER_SOCKET_DIR = "/tmp/animebot-cluster"
+WEBHOOK_URL = ""  # public https URL, e.g. "https://example.com/telegram"
+WEBHOOK_LISTEN = "127.0.0.1"
+WEBHOOK_PORT = 8080
+WEBHOOK_PATH = "telegram"
+WEBHOOK_SECRET = ""  # secret_token sent by Telegram with every update
+
+# Caption rendering
+RENDER_CACHE_SIZE = 2048  # cached captions
+CAPTION_LIMIT = 1024  # Telegram limit for media captions
+MESSAGE_LIMIT = 4096  # Telegram limit for text messages
+
+# No-op edit suppression
+EDIT_FINGERPRINT_CACHE_SIZE = 20000  # messages whose last content is remembered
+
+# Scheduled releases
+RELEASES_FILE = "releases.json"
+RELEASE_RETRY_DELAY = 60  # seconds before retrying a release that failed to publish
+
+# Backups
+BACKUP_DIR = "backups"
+BACKUP_INTERVAL = 6 * 3600  # seconds between automatic backups
+BACKUP_KEEP = 14  # newest backups kept, older ones are deleted
+BACKUP_COMPRESSION_LEVEL = 6  # gzip level, 1 (fast) to 9 (small)
+
+# Admin statistics
+STATS_FILE = "stats.json"
+STATS_DAYS = 30  # daily buckets kept
+STATS_FLUSH_INTERVAL = 60  # seconds between batched writes
+
+# Logging (logs.py)
+LOG_LEVEL = "INFO"
+LOG_FILE = ""  # JSON lines are written here, or to stderr if empty
+LOG_SAMPLE_RATES = {"httpx": 0.05}  # logger -> share of its INFO records kept
+
+# Update recording (recorder.py, replay with replay.py)
+RECORD_UPDATES = False  # write every incoming update to RECORD_DIR
+RECORD_DIR = "recordings"
+RECORD_FILE_BYTES = 64 * 1024 * 1024  # uncompressed bytes per file before starting a new one
+RECORD_KEEP = 20  # newest recording files kept, older ones are deleted
+
+# Per-anime subscriptions and new-episode notifications
+SUBSCRIPTIONS_FILE = "subscriptions.json"
+SUBSCRIPTIONS_FLUSH_INTERVAL = 30  # seconds between batched subscription writes
+NOTIFY_WORKERS = 4  # notifications in flight at once; the gateway sets the actual rate
+
+# Latest releases feed
+FEED_FILE = "feed.json"
+FEED_SIZE = 100  # newest releases kept
+FEED_PAGE_SIZE = 10  # entries per page of the "Yangi qismlar" screen
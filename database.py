@@ -1,15 +1,25 @@
-import json
 import logging
 from datetime import datetime
 from config import DATA_FILE, USER_FILE, ADMIN_IDS, CHANNEL_ID
-from telegram import Bot
+from telegram import Bot, InputMediaPhoto, InputMediaVideo
 from telegram.constants import ParseMode
+from storage import CachedStore
+from users import UserTable
+from render import render_caption, render_message
+from deeplinks import start_link
+from views import forget_anime_views
+from progress import forget_anime_progress
+from subscriptions import forget_anime_subscriptions
+from notifier import notify_new_episode
+from feed import push_release, forget_anime_releases
+from scheduler import schedule_release, forget_scheduled_releases
+from stats import (
+    record_stat, SIGNUPS, VIP_ADDED, VIP_REMOVED, ANIMES_ADDED, ANIMES_DELETED,
+    EPISODES_ADDED, EPISODES
+)
 import asyncio
+import time
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
 # Bot instance for channel posting
@@ -19,40 +29,68 @@ def set_bot(bot_instance):
     global bot
     bot = bot_instance
 
+# Cached stores; every process shares the files and keeps its own copy in memory
+catalog_store = CachedStore("data", DATA_FILE, "animes")
+user_store = UserTable("users", USER_FILE)
+STORES = {store.name: store for store in (catalog_store, user_store)}
+
 # Load data from files
 def load_data():
-    try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"animes": []}
+    """Return the catalog. The dict is shared - change it only through the helpers below."""
+    return catalog_store.get()
 
 def load_users():
-    try:
-        with open(USER_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"users": []}
+    """Return a copy of the users file contents (one list per column)."""
+    return user_store.to_dict()
 
 # Save data to files
 def save_data(data):
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    catalog_store.replace_all(data)
 
 def save_users(data):
-    with open(USER_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    user_store.replace_all(data)
 
 # Helper functions
 def is_admin(user_id):
     return user_id in ADMIN_IDS
 
 def get_anime_by_id(anime_id):
-    data = load_data()
-    for anime in data["animes"]:
-        if anime["id"] == anime_id:
-            return anime
-    return None
+    return catalog_store.get_record(anime_id)
+
+def is_released(item):
+    """Anime and episodes with a pending release time are hidden from users."""
+    return "release_at" not in item
+
+def visible_episodes(anime):
+    """How many episodes of anime users can watch (the EPISODES statistic counts these)."""
+    if not is_released(anime):
+        return 0
+    return sum(1 for ep in anime.get("episodes", []) if is_released(ep))
+
+# (catalog version, released animes) so filtering runs once per catalog change
+_released_cache = (None, [])
+
+def released_animes():
+    global _released_cache
+    version = catalog_store.version
+    if _released_cache[0] != version:
+        _released_cache = (version, [a for a in catalog_store.records() if is_released(a)])
+    return _released_cache[1]
+
+# (catalog version, anime id -> {episode number: episode}), filled per anime on first use
+_episode_cache = (None, {})
+
+def get_episode(anime, episode_number):
+    """The episode of anime with this number (released or not), or None."""
+    global _episode_cache
+    version = catalog_store.version
+    if _episode_cache[0] != version:
+        _episode_cache = (version, {})
+    episodes = _episode_cache[1].get(anime["id"])
+    if episodes is None:
+        episodes = {ep["number"]: ep for ep in anime.get("episodes", [])}
+        _episode_cache[1][anime["id"]] = episodes
+    return episodes.get(episode_number)
 
 def get_anime_by_code(code):
     data = load_data()
@@ -62,15 +100,23 @@ def get_anime_by_code(code):
     return None
 
 def get_user_by_id(user_id):
-    users = load_users()
-    for user in users["users"]:
-        if user["id"] == user_id:
-            return user
-    return None
+    return user_store.get_record(user_id)
 
 def is_vip(user_id):
-    user = get_user_by_id(user_id)
-    return user and user.get("vip", False)
+    return user_store.is_vip(user_id)
+
+def count_animes():
+    return len(catalog_store.records())
+
+def count_users():
+    return len(user_store)
+
+def count_vip_users():
+    return user_store.vip_count
+
+def list_users(offset, limit):
+    """A page of users in join order."""
+    return user_store.page(offset, limit)
 
 def generate_anime_id():
     data = load_data()
@@ -82,18 +128,17 @@ def generate_anime_id():
     return f"ANM{num:03d}"
 
 def register_user(user):
-    users = load_users()
-    if not any(u["id"] == user.id for u in users["users"]):
-        users["users"].append({
-            "id": user.id,
-            "username": user.username,
-            "first_name": user.first_name,
-            "joined_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "vip": False
-        })
-        save_users(users)
-        return True
-    return False
+    if not user_store.add(user.id, user.username, user.first_name):
+        return False
+    record_stat(SIGNUPS)
+    return True
+
+async def flush_users(context=None) -> None:
+    """Write newly registered users to disk in one batch (JobQueue callback)."""
+    try:
+        await user_store.flush()
+    except OSError as e:
+        logger.error(f"Error saving users: {e}")
 
 async def post_anime_to_channel(anime_data):
     """Post anime to channel with nice formatting and stickers."""
@@ -103,39 +148,46 @@ async def post_anime_to_channel(anime_data):
     
     try:
         # Create a nicely formatted message with emojis
-        caption = (
-            f"🌟 <b>YANGI ANIME QO'SHILDI!</b> 🌟\n\n"
-            f"📺 <b>{anime_data['name']}</b> ({anime_data['id']})\n\n"
-            f"📝 <b>Tavsif:</b>\n{anime_data['description']}\n\n"
-            f"🔍 <b>Kod:</b> {anime_data['code']}\n"
-            f"📅 <b>Qo'shilgan sana:</b> {datetime.now().strftime('%Y-%m-%d')}\n\n"
-            f"🤖 @{(await bot.get_me()).username} orqali ko'ring!"
+        post = dict(
+            date=datetime.now().strftime('%Y-%m-%d'),
+            bot_username=bot.username,
+            link=start_link(bot.username, anime_data["id"])
         )
         
-        # Send photo with caption
-        if anime_data.get("image_id"):
+        # Photo and trailer go out as one album (one API call)
+        if anime_data.get("image_id") and anime_data.get("video_id"):
+            await bot.send_media_group(
+                chat_id=CHANNEL_ID,
+                media=[
+                    InputMediaPhoto(
+                        media=anime_data["image_id"],
+                        caption=render_caption("channel_anime", anime_data, **post),
+                        parse_mode=ParseMode.HTML
+                    ),
+                    InputMediaVideo(
+                        media=anime_data["video_id"],
+                        caption=render_caption("trailer", anime_data),
+                        parse_mode=ParseMode.HTML
+                    )
+                ]
+            )
+            
+            return True
+        elif anime_data.get("image_id"):
+            # Send photo with caption
             await bot.send_photo(
                 chat_id=CHANNEL_ID,
                 photo=anime_data["image_id"],
-                caption=caption,
+                caption=render_caption("channel_anime", anime_data, **post),
                 parse_mode=ParseMode.HTML
             )
             
-            # If there's a video, send it as a follow-up
-            if anime_data.get("video_id"):
-                await bot.send_video(
-                    chat_id=CHANNEL_ID,
-                    video=anime_data["video_id"],
-                    caption=f"🎬 <b>{anime_data['name']}</b> - Treyler",
-                    parse_mode=ParseMode.HTML
-                )
-            
             return True
         else:
             # If no image, just send text
             await bot.send_message(
                 chat_id=CHANNEL_ID,
-                text=caption,
+                text=render_message("channel_anime", anime_data, **post),
                 parse_mode=ParseMode.HTML
             )
             return True
@@ -145,9 +197,7 @@ async def post_anime_to_channel(anime_data):
 
 async def add_anime_to_db_async(anime_data):
     """Add anime to database and post to channel asynchronously."""
-    data = load_data()
-    data["animes"].append(anime_data)
-    save_data(data)
+    catalog_store.insert(anime_data, unique=False)
     
     # Post to channel
     await post_anime_to_channel(anime_data)
@@ -155,57 +205,137 @@ async def add_anime_to_db_async(anime_data):
     return anime_data["id"]
 
 def add_anime_to_db(anime_data):
-    """Add anime to database and post to channel."""
-    data = load_data()
-    data["animes"].append(anime_data)
-    save_data(data)
+    """Add anime to database and post to channel (or schedule its release)."""
+    release_at = anime_data.get("release_at")
+    if release_at is not None and release_at <= time.time():
+        del anime_data["release_at"]
+        release_at = None
     
-    # Schedule the channel posting for later
-    # We don't wait for it to complete here to avoid event loop issues
-    asyncio.create_task(post_anime_to_channel(anime_data))
+    if release_at is not None:
+        # Scheduled before saving, so a failure never leaves a hidden anime without a release
+        schedule_release(release_at, anime_data["id"])
+    
+    catalog_store.insert(anime_data, unique=False)
+    record_stat(ANIMES_ADDED)
+    record_stat(EPISODES, visible_episodes(anime_data), daily=False)
+    
+    if release_at is None:
+        push_release(anime_data["id"])
+        # Schedule the channel posting for later
+        # We don't wait for it to complete here to avoid event loop issues
+        asyncio.create_task(post_anime_to_channel(anime_data))
     
     return anime_data["id"]
 
 def delete_anime_from_db(anime_id):
-    data = load_data()
-    for i, anime in enumerate(data["animes"]):
-        if anime["id"] == anime_id:
-            del data["animes"][i]
-            save_data(data)
-            return True
+    anime = get_anime_by_id(anime_id)
+    if anime and catalog_store.delete(anime_id):
+        record_stat(ANIMES_DELETED)
+        record_stat(EPISODES, -visible_episodes(anime), daily=False)
+        forget_anime_views(anime_id)
+        forget_anime_progress(anime_id)
+        forget_anime_subscriptions(anime_id)
+        forget_anime_releases(anime_id)
+        forget_scheduled_releases(anime_id)
+        return True
     return False
 
-def add_episode_to_anime(anime_id, episode_number, episode_url):
-    data = load_data()
-    for anime in data["animes"]:
-        if anime["id"] == anime_id:
-            # Check if episode already exists
-            for i, ep in enumerate(anime.get("episodes", [])):
-                if ep["number"] == episode_number:
-                    # Update existing episode
-                    anime["episodes"][i]["url"] = episode_url
-                    break
-            else:
-                # Add new episode
-                if "episodes" not in anime:
-                    anime["episodes"] = []
-                
-                anime["episodes"].append({
-                    "number": episode_number,
-                    "url": episode_url
-                })
-                
-                # Sort episodes by number
-                anime["episodes"].sort(key=lambda x: x["number"])
-            
-            save_data(data)
-            
-            # Schedule the channel posting for later
-            # We don't wait for it to complete here to avoid event loop issues
-            asyncio.create_task(post_episode_to_channel(anime, episode_number, episode_url))
+def add_episode_to_anime(anime_id, episode_number, episode_url, release_at=None):
+    """Add or replace an episode. With a future release_at it stays hidden until then."""
+    scheduled = release_at is not None and release_at > time.time()
+    added = []
+    visible_before = []
+    
+    def add_episode(anime):
+        # Check if episode already exists
+        for ep in anime.setdefault("episodes", []):
+            if ep["number"] == episode_number:
+                # Update existing episode
+                ep["url"] = episode_url
+                episode = ep
+                if is_released(ep):
+                    visible_before.append(episode_number)
+                break
+        else:
+            # Add new episode
+            episode = {
+                "number": episode_number,
+                "url": episode_url
+            }
+            anime["episodes"].append(episode)
+            added.append(episode_number)
             
-            return True
-    return False
+            # Sort episodes by number
+            anime["episodes"].sort(key=lambda x: x["number"])
+        
+        if scheduled:
+            episode["release_at"] = release_at
+        else:
+            episode.pop("release_at", None)
+    
+    if scheduled:
+        # Scheduled before saving, so a failure never leaves a hidden episode without a release;
+        # a release whose episode was not saved is skipped by publish_release
+        schedule_release(release_at, anime_id, episode_number)
+    
+    anime = catalog_store.update(anime_id, add_episode)
+    if anime is None:
+        return False
+    
+    if added:
+        record_stat(EPISODES_ADDED)
+    if is_released(anime):
+        # Hidden episodes are counted by publish_release when they come out
+        visible_change = (not scheduled) - bool(visible_before)
+        if visible_change:
+            record_stat(EPISODES, visible_change, daily=False)
+    
+    if not scheduled and is_released(anime):
+        # Schedule the channel posting for later
+        # We don't wait for it to complete here to avoid event loop issues
+        asyncio.create_task(post_episode_to_channel(anime, episode_number, episode_url))
+        if added:
+            push_release(anime_id, episode_number)
+            if bot is not None:
+                # Queued only; the notifier sends in the background
+                notify_new_episode(bot, anime, episode_number)
+    
+    return True
+
+async def publish_release(anime_id, episode_number=None):
+    """Make a scheduled anime or episode visible and announce it in the channel."""
+    released = []
+    now = time.time()
+    
+    def release(item):
+        # Rescheduled items keep their old heap entry; only the stored time counts
+        if item.get("release_at") is not None and item["release_at"] <= now:
+            del item["release_at"]
+            released.append(item)
+    
+    def release_due(anime):
+        if episode_number is None:
+            release(anime)
+            return
+        for ep in anime.get("episodes", []):
+            if ep["number"] == episode_number:
+                release(ep)
+    
+    anime = catalog_store.update(anime_id, release_due)
+    if anime is None or not released:
+        # Deleted, rescheduled, or already published another way
+        return
+    
+    if episode_number is None:
+        record_stat(EPISODES, visible_episodes(anime), daily=False)
+        push_release(anime_id)
+        await post_anime_to_channel(anime)
+    elif is_released(anime):
+        record_stat(EPISODES, daily=False)
+        push_release(anime_id, episode_number)
+        if bot is not None:
+            notify_new_episode(bot, anime, episode_number)
+        await post_episode_to_channel(anime, episode_number, released[0]["url"])
 
 async def post_episode_to_channel(anime, episode_number, episode_url):
     """Post episode to channel with nice formatting."""
@@ -215,11 +345,12 @@ async def post_episode_to_channel(anime, episode_number, episode_url):
     
     try:
         # Create a nicely formatted message with emojis
-        caption = (
-            f"🎬 <b>YANGI EPIZOD!</b> 🎬\n\n"
-            f"📺 <b>{anime['name']}</b> - {episode_number}-qism\n\n"
-            f"📅 <b>Qo'shilgan sana:</b> {datetime.now().strftime('%Y-%m-%d')}\n\n"
-            f"🤖 @{(await bot.get_me()).username} orqali ko'ring!"
+        caption = render_caption(
+            "channel_episode", anime,
+            episode=episode_number,
+            date=datetime.now().strftime('%Y-%m-%d'),
+            bot_username=bot.username,
+            link=start_link(bot.username, anime["id"], episode_number)
         )
         
         # Send video with caption
@@ -235,22 +366,25 @@ async def post_episode_to_channel(anime, episode_number, episode_url):
         logger.error(f"Error posting episode to channel: {e}")
         return False
 
-def toggle_user_vip(user_id):
-    users = load_users()
-    for user in users["users"]:
-        if user["id"] == user_id:
-            user["vip"] = not user.get("vip", False)
-            save_users(users)
-            return user["vip"]
-    return False
+async def toggle_user_vip(user_id):
+    vip = await user_store.set_vip(user_id)
+    if vip is not None:
+        record_stat(VIP_ADDED if vip else VIP_REMOVED)
+    return bool(vip)
+
+def toggle_anime_completed(anime_id):
+    def toggle(anime):
+        anime["completed"] = not anime.get("completed", False)
+    
+    anime = catalog_store.update(anime_id, toggle)
+    return anime["completed"] if anime else False
 
 def search_anime(query):
-    data = load_data()
     results = []
     query = query.strip().lower()
     
     # Search by ID, code or name
-    for anime in data["animes"]:
+    for anime in released_animes():
         if (query == anime["id"].lower() or 
             query == anime.get("code", "").lower() or 
             query in anime["name"].lower()):
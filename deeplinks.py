@@ -0,0 +1,44 @@
+import re
+
+# Telegram allows A-Z, a-z, 0-9, _ and - in /start payloads, up to 64 characters
+PAYLOAD_MAX_LENGTH = 64
+_PAYLOAD = re.compile(r"[A-Za-z0-9_-]+")
+
+def make_payload(anime_id, episode_number=None):
+    """Payload for an anime ("ANM001") or one of its episodes ("ANM001-5"); None if the id cannot be encoded."""
+    payload = anime_id if episode_number is None else f"{anime_id}-{episode_number}"
+    if len(payload) > PAYLOAD_MAX_LENGTH or not _PAYLOAD.fullmatch(payload):
+        return None
+    return payload
+
+def start_link(bot_username, anime_id, episode_number=None):
+    """t.me link that opens the bot with the payload, or a plain bot link."""
+    payload = make_payload(anime_id, episode_number)
+    if payload is None:
+        return f"https://t.me/{bot_username}"
+    return f"https://t.me/{bot_username}?start={payload}"
+
+def resolve_payload(payload):
+    """(anime, episode number or None) for a /start payload, or (None, None).
+
+    Both lookups are dict hits: the anime by id, then the episode through
+    the per-anime episode index, so a link costs the same at any catalog
+    size.
+    """
+    from database import get_anime_by_id, get_episode
+
+    if not payload or len(payload) > PAYLOAD_MAX_LENGTH:
+        return None, None
+
+    # An anime id may itself contain "-", so try the whole payload first
+    anime = get_anime_by_id(payload)
+    if anime is not None:
+        return anime, None
+
+    anime_id, _, number = payload.rpartition("-")
+    if not anime_id or not number.isdigit():
+        return None, None
+    anime = get_anime_by_id(anime_id)
+    if anime is None or get_episode(anime, int(number)) is None:
+        return None, None
+    return anime, int(number)
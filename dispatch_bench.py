@@ -0,0 +1,94 @@
+"""Measure the handler dispatch cost of ordinary user messages.
+
+Feeds text and video messages from non-admin users straight into
+Application.process_update of the real bot.build_application() and reports
+the time per update. None of these messages should start anything, so the
+number is pure dispatch overhead: anti-flood plus every handler that has to
+look at the update before it is dropped.
+
+Example:
+    python dispatch_bench.py --updates 50000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+from telegram import Update
+from telegram.ext import Application
+
+from fake_bot_api import FakeBotAPI
+
+
+def make_update(update_id, user_id, video, rng):
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+        "from": user,
+    }
+    if video:
+        message["video"] = {"file_id": f"video{update_id}", "file_unique_id": f"v{update_id}",
+                            "width": 640, "height": 360, "duration": 1}
+    else:
+        message["text"] = rng.choice(["salom", "naruto", "1", "qachon chiqadi?"])
+    return {"update_id": update_id, "message": message}
+
+
+async def run(args):
+    # Work in an empty directory so no real data files are touched
+    os.chdir(tempfile.mkdtemp(prefix="bot-dispatch-bench-"))
+    server = FakeBotAPI().start()
+    from bot import build_application
+    logging.disable(logging.INFO)
+
+    application = build_application(
+        Application.builder()
+        .token("123456:BENCH")
+        .base_url(server.base_url)
+        .base_file_url(server.base_file_url)
+    )
+    # Only getMe reaches the fake server; the messages never cause API calls
+    await application.initialize()
+    rng = random.Random(args.seed)
+
+    # A new user per update keeps anti-flood from dropping anything early
+    payloads = [
+        make_update(i, 10_000_000 + i, rng.random() < args.video_share, rng)
+        for i in range(args.updates)
+    ]
+    updates = [Update.de_json(payload, application.bot) for payload in payloads]
+
+    for update in updates[:args.warmup]:
+        await application.process_update(update)
+
+    started = time.perf_counter()
+    for update in updates[args.warmup:]:
+        await application.process_update(update)
+    elapsed = time.perf_counter() - started
+    await application.shutdown()
+    server.stop()
+
+    count = len(updates) - args.warmup
+    print(f"handler groups: {sorted(application.handlers)}")
+    print(f"handlers:       {sum(len(h) for h in application.handlers.values())}")
+    print(f"updates:        {count}")
+    print(f"per update:     {elapsed / count * 1e6:.1f} us")
+    print(f"throughput:     {count / elapsed:.0f} updates/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=20000, help="messages to dispatch")
+    parser.add_argument("--warmup", type=int, default=1000, help="messages dispatched before timing")
+    parser.add_argument("--video-share", type=float, default=0.2, help="fraction of video messages")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import logging
+from collections import Counter, OrderedDict
+from telegram import CallbackQuery
+from telegram.error import BadRequest
+from config import EDIT_FINGERPRINT_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# (chat_id, message_id) -> (text fingerprint, markup fingerprint), least recently used first
+_fingerprints = OrderedDict()
+
+# "skipped", "markup_only", "full" and "not_modified" edit counts
+edit_stats = Counter()
+
+def _fingerprint(text, reply_markup, parse_mode):
+    text_fp = hash((text, parse_mode))
+    markup_fp = hash(reply_markup.to_json()) if reply_markup else None
+    return text_fp, markup_fp
+
+def _remember(key, fingerprint):
+    _fingerprints[key] = fingerprint
+    _fingerprints.move_to_end(key)
+    if len(_fingerprints) > EDIT_FINGERPRINT_CACHE_SIZE:
+        _fingerprints.popitem(last=False)
+
+def _shows(message, text, reply_markup, parse_mode):
+    """Whether the callback's message already shows exactly this plain text and keyboard."""
+    return (
+        parse_mode is None
+        and message.text == text
+        and message.reply_markup == reply_markup
+    )
+
+async def edit_message(query: CallbackQuery, text, reply_markup=None, parse_mode=None, **kwargs):
+    """edit_message_text that skips edits which would not change anything.
+
+    The last text and keyboard sent to each message are fingerprinted. An
+    identical edit is dropped, and one where only the keyboard changed goes
+    out as editMessageReplyMarkup.
+    """
+    message = query.message
+    if message is None:
+        # Inline message: nothing to compare against
+        return await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode, **kwargs)
+
+    key = (message.chat_id, message.message_id)
+    fingerprint = _fingerprint(text, reply_markup, parse_mode)
+    previous = _fingerprints.get(key)
+
+    if previous == fingerprint or (previous is None and _shows(message, text, reply_markup, parse_mode)):
+        edit_stats["skipped"] += 1
+        _remember(key, fingerprint)
+        return message
+
+    try:
+        if previous is not None and previous[0] == fingerprint[0]:
+            edit_stats["markup_only"] += 1
+            result = await query.edit_message_reply_markup(reply_markup=reply_markup)
+        else:
+            edit_stats["full"] += 1
+            result = await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode, **kwargs)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+        edit_stats["not_modified"] += 1
+        result = message
+
+    _remember(key, fingerprint)
+    return result
+
+async def edit_markup(query: CallbackQuery, reply_markup):
+    """Replace only the keyboard (works on media messages too), skipping no-op edits."""
+    message = query.message
+    markup_fp = hash(reply_markup.to_json()) if reply_markup else None
+    key = (message.chat_id, message.message_id) if message else None
+    previous = _fingerprints.get(key) if key else None
+
+    if previous is not None and previous[1] == markup_fp:
+        edit_stats["skipped"] += 1
+        return message
+
+    try:
+        edit_stats["markup_only"] += 1
+        result = await query.edit_message_reply_markup(reply_markup=reply_markup)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+        edit_stats["not_modified"] += 1
+        result = message
+
+    if previous is not None:
+        _remember(key, (previous[0], markup_fp))
+    return result
+
+def get_edit_stats():
+    return {**edit_stats, "tracked_messages": len(_fingerprints)}
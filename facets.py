@@ -0,0 +1,94 @@
+from database import catalog_store, released_animes
+
+# Telegram callback data is limited to 64 bytes and carries the genre key
+GENRE_MAX_BYTES = 40
+
+def parse_genres(text):
+    """Split "Jangari, romantika" into genre names, dropping blanks and repeats."""
+    genres = []
+    seen = set()
+    for name in text.split(","):
+        name = " ".join(name.split()).encode("utf-8")[:GENRE_MAX_BYTES].decode("utf-8", errors="ignore").strip()
+        if name and name.casefold() not in seen:
+            seen.add(name.casefold())
+            genres.append(name)
+    return genres
+
+def _bitmap(positions, size):
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, "little")
+
+class FacetIndex:
+    """Bitmaps over the released animes for combining browse filters.
+
+    Bit i stands for the i-th released anime. Every genre has a bitmap, as do
+    VIP-only and completed animes, so a query is a few big-integer ANDs no
+    matter how many animes match each filter.
+    """
+
+    def __init__(self, animes):
+        self.animes = animes
+        self.all = (1 << len(animes)) - 1
+
+        positions = {}
+        vip = []
+        completed = []
+        self.names = {}  # genre key -> display name
+        for i, anime in enumerate(animes):
+            for name in anime.get("genres", []):
+                key = name.casefold()
+                self.names.setdefault(key, name)
+                positions.setdefault(key, []).append(i)
+            if anime.get("vip", False):
+                vip.append(i)
+            if anime.get("completed", False):
+                completed.append(i)
+
+        size = len(animes)
+        self.genres = {key: _bitmap(p, size) for key, p in positions.items()}
+        self.counts = {key: len(p) for key, p in positions.items()}
+        self.vip = _bitmap(vip, size)
+        self.completed = _bitmap(completed, size)
+
+    def genre_list(self):
+        """(key, display name, count) for every genre, most used first."""
+        return sorted(
+            ((key, self.names[key], count) for key, count in self.counts.items()),
+            key=lambda item: (-item[2], item[1].casefold())
+        )
+
+    def query(self, genres=(), vip_only=False, completed_only=False):
+        """Bitmap of the animes matching every filter."""
+        mask = self.all
+        for key in genres:
+            mask &= self.genres.get(key, 0)
+        if vip_only:
+            mask &= self.vip
+        if completed_only:
+            mask &= self.completed
+        return mask
+
+    def page(self, mask, offset, limit):
+        """Animes for the set bits of mask, skipping the first offset."""
+        bits = bin(mask)[:1:-1]  # bit 0 first
+        result = []
+        position = bits.find("1")
+        while position != -1 and len(result) < limit:
+            if offset:
+                offset -= 1
+            else:
+                result.append(self.animes[position])
+            position = bits.find("1", position + 1)
+        return result
+
+# (catalog version, index) so bitmaps are built once per catalog change
+_index_cache = (None, None)
+
+def facet_index():
+    global _index_cache
+    version = catalog_store.version
+    if _index_cache[0] != version:
+        _index_cache = (version, FacetIndex(released_animes()))
+    return _index_cache[1]
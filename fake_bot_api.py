@@ -0,0 +1,259 @@
+"""Local stand-in for the Telegram Bot API used for load testing.
+
+Implements the methods this bot calls (getUpdates, sendMessage, editMessageText,
+sendPhoto, sendVideo, answerCallbackQuery, getMe, ...) with configurable
+latency and 429 injection. Never point it at real users - it answers every
+request itself and never talks to Telegram.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+BOT_USER = {
+    "id": 1000000001,
+    "is_bot": True,
+    "first_name": "Fake Anime Bot",
+    "username": "fake_anime_bot",
+    "can_join_groups": True,
+    "can_read_all_group_messages": False,
+    "supports_inline_queries": False,
+}
+
+# Methods that return a freshly "sent" Message object
+MESSAGE_METHODS = {
+    "sendmessage", "sendphoto", "sendvideo", "senddocument",
+    "editmessagetext", "editmessagecaption", "editmessagereplymarkup",
+}
+
+
+class FakeBotAPI:
+    """In-process fake Bot API server running in a background thread."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, retry_after=1, method_latency=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.method_latency = {k.lower(): v for k, v in (method_latency or {}).items()}
+        self.random = random.Random(seed)
+
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.listeners = []
+
+        self._updates = deque()
+        self._cond = threading.Condition()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._stats_lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        # Clients dropping keep-alive connections on shutdown is not an error here
+        self._server.handle_error = lambda request, client_address: None
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self):
+        """Value for ApplicationBuilder.base_url()."""
+        return f"{self.url}/bot"
+
+    @property
+    def base_file_url(self):
+        """Value for ApplicationBuilder.base_file_url()."""
+        return f"{self.url}/file/bot"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._cond.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def push_update(self, update):
+        """Queue an update for getUpdates and return its update_id."""
+        with self._cond:
+            update_id = self._next_update_id
+            self._next_update_id += 1
+            self._updates.append({**update, "update_id": update_id})
+            self._cond.notify_all()
+        return update_id
+
+    def pending_updates(self):
+        with self._cond:
+            return len(self._updates)
+
+    def add_listener(self, callback):
+        """Register callback(method, params) called for every API request."""
+        self.listeners.append(callback)
+
+    # Request handling
+    def _get_updates(self, params):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            # Updates below the offset are confirmed and can be dropped
+            while self._updates and self._updates[0]["update_id"] < offset:
+                self._updates.popleft()
+
+            while not self._updates:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+
+            return [self._updates[i] for i in range(min(limit, len(self._updates)))]
+
+    def _message(self, method, params):
+        with self._stats_lock:
+            message_id = self._next_message_id
+            self._next_message_id += 1
+
+        chat_id = params.get("chat_id")
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+
+        message = {
+            "message_id": int(params.get("message_id") or message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id or 0, "type": "private"},
+            "from": BOT_USER,
+        }
+        if "text" in params:
+            message["text"] = params["text"]
+        if "caption" in params:
+            message["caption"] = params["caption"]
+        if method == "sendphoto":
+            message["photo"] = [{"file_id": str(params.get("photo")), "file_unique_id": "p",
+                                 "width": 1, "height": 1}]
+        elif method == "sendvideo":
+            message["video"] = {"file_id": str(params.get("video")), "file_unique_id": "v",
+                                "width": 1, "height": 1, "duration": 1}
+        elif method == "senddocument":
+            message["document"] = {"file_id": "d", "file_unique_id": "d"}
+        if "reply_markup" in params:
+            try:
+                message["reply_markup"] = json.loads(params["reply_markup"])
+            except (TypeError, ValueError):
+                pass
+        return message
+
+    def _media_group(self, params):
+        media = json.loads(params.get("media") or "[]")
+        return [
+            self._message("send" + item.get("type", "photo"), {
+                "chat_id": params.get("chat_id"),
+                item.get("type", "photo"): item.get("media"),
+                **({"caption": item["caption"]} if "caption" in item else {}),
+            })
+            for item in media
+        ]
+
+    def handle(self, method, params):
+        """Return (status, payload) for a Bot API call."""
+        method = method.lower()
+        with self._stats_lock:
+            self.calls[method] += 1
+        for callback in self.listeners:
+            callback(method, params)
+
+        if method == "getupdates":
+            return 200, {"ok": True, "result": self._get_updates(params)}
+
+        delay = self.method_latency.get(method, self.latency)
+        if self.jitter:
+            delay += self.random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            with self._stats_lock:
+                self.throttled[method] += 1
+            return 429, {
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }
+
+        if method == "getme":
+            result = BOT_USER
+        elif method in MESSAGE_METHODS:
+            result = self._message(method, params)
+        elif method == "sendmediagroup":
+            result = self._media_group(params)
+        else:
+            # answerCallbackQuery, deleteWebhook, setMyCommands, ...
+            result = True
+        return 200, {"ok": True, "result": result}
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid Nagle/delayed-ACK stalls
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _params(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                content_type = self.headers.get("Content-Type", "")
+
+                if content_type.startswith("application/json"):
+                    return json.loads(body or b"{}")
+                if content_type.startswith("multipart/form-data"):
+                    message = BytesParser(policy=HTTP).parsebytes(
+                        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body
+                    )
+                    params = {}
+                    for part in message.iter_parts():
+                        name = part.get_param("name", header="content-disposition")
+                        if part.get_filename():
+                            params[name] = part.get_filename()
+                        else:
+                            params[name] = part.get_content()
+                    return params
+                return {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                # Paths look like /bot<token>/<method>
+                method = self.path.rstrip("/").rsplit("/", 1)[-1]
+                status, payload = api.handle(method, self._params())
+                self._reply(status, payload)
+
+            do_GET = do_POST
+
+        return Handler
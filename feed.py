@@ -0,0 +1,111 @@
+import logging
+import time
+from config import FEED_FILE, FEED_SIZE, CACHE_CHECK_INTERVAL
+from storage import file_lock, read_json, write_json_atomic, file_signature
+
+logger = logging.getLogger(__name__)
+
+class ReleaseFeed:
+    """The last FEED_SIZE releases in a fixed-size ring buffer.
+
+    Entries are [anime_id, episode_number or None for a new anime,
+    released_at]. slots never grows: head is where the next entry goes and
+    overwrites the oldest once the buffer is full, so a push is O(1) and
+    the i-th newest entry is slots[(head - 1 - i) % size]. A page therefore
+    costs its own length, whatever the catalog size.
+
+    The file holds the entries oldest first. Pushes are rare (admin
+    actions), so each one rewrites it under the lock after re-reading what
+    other processes added; readers reload when the file changes.
+    """
+
+    def __init__(self, size=FEED_SIZE):
+        self.size = size
+        self.slots = [None] * size
+        self.head = 0
+        self.count = 0
+        self.signature = None
+        self.checked_at = 0.0
+
+    def _append(self, entry):
+        self.slots[self.head] = entry
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def entries(self):
+        """All entries, oldest first."""
+        return [self.slots[(self.head - self.count + i) % self.size] for i in range(self.count)]
+
+    def load(self, entries):
+        self.slots = [None] * self.size
+        self.head = 0
+        self.count = 0
+        for entry in entries[-self.size:]:
+            self._append(list(entry))
+
+    def reload(self):
+        self.signature = file_signature(FEED_FILE)
+        self.checked_at = time.monotonic()
+        self.load(read_json(FEED_FILE, list))
+
+    def _check(self):
+        if time.monotonic() - self.checked_at >= CACHE_CHECK_INTERVAL:
+            self.checked_at = time.monotonic()
+            if file_signature(FEED_FILE) != self.signature:
+                self.reload()
+
+    def _save(self):
+        write_json_atomic(FEED_FILE, self.entries(), separators=(",", ":"))
+        self.signature = file_signature(FEED_FILE)
+
+    def push(self, anime_id, episode_number=None, now=None):
+        with file_lock(FEED_FILE):
+            self.reload()
+            self._append([anime_id, episode_number, int(time.time() if now is None else now)])
+            self._save()
+
+    def forget_anime(self, anime_id):
+        """Drop a deleted anime's entries; O(FEED_SIZE)."""
+        with file_lock(FEED_FILE):
+            self.reload()
+            entries = self.entries()
+            kept = [entry for entry in entries if entry[0] != anime_id]
+            if len(kept) != len(entries):
+                self.load(kept)
+                self._save()
+
+    def __len__(self):
+        self._check()
+        return self.count
+
+    def page(self, offset, limit):
+        """Entries offset..offset+limit counting from the newest."""
+        self._check()
+        return [
+            self.slots[(self.head - 1 - i) % self.size]
+            for i in range(offset, min(offset + limit, self.count))
+        ]
+
+release_feed = ReleaseFeed()
+
+def load_feed():
+    release_feed.reload()
+
+def push_release(anime_id, episode_number=None):
+    """Put a just released anime (episode_number None) or episode at the top of the feed."""
+    try:
+        release_feed.push(anime_id, episode_number)
+    except OSError as e:
+        logger.error(f"Error saving release feed: {e}")
+
+def forget_anime_releases(anime_id):
+    try:
+        release_feed.forget_anime(anime_id)
+    except OSError as e:
+        logger.error(f"Error saving release feed: {e}")
+
+def count_releases():
+    return len(release_feed)
+
+def latest_releases(offset, limit):
+    return release_feed.page(offset, limit)
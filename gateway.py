@@ -0,0 +1,259 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import socket
+import time
+from datetime import timedelta
+from telegram.error import RetryAfter
+from telegram.ext import ApplicationBuilder, BaseRateLimiter
+from telegram.request import HTTPXRequest
+from config import (
+    GATEWAY_GLOBAL_RATE, GATEWAY_GLOBAL_BURST, GATEWAY_GROUP_CHAT_INTERVAL,
+    GATEWAY_MAX_RETRIES, GATEWAY_POOL_SIZE, GATEWAY_POOL_TIMEOUT,
+    GATEWAY_READ_TIMEOUT, GATEWAY_CONNECT_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower goes first. Pass one as rate_limit_args to override the default.
+PRIORITY_INTERACTIVE = 0  # callback answers
+PRIORITY_REPLY = 1  # replies and edits in private chats
+PRIORITY_CHANNEL = 2  # channel and group posts
+PRIORITY_BULK = 3  # broadcasts and notifications
+
+LANE_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_REPLY: "reply",
+    PRIORITY_CHANNEL: "channel",
+    PRIORITY_BULK: "bulk",
+}
+
+INTERACTIVE_ENDPOINTS = {"answerCallbackQuery", "answerInlineQuery"}
+
+# Lanes that wait for the global bucket; the others only answer users one by one
+GLOBAL_LANES = {PRIORITY_CHANNEL, PRIORITY_BULK}
+
+def is_group_chat(chat_id):
+    """Channels (@username or -100...) and groups have stricter per-chat limits."""
+    if isinstance(chat_id, str):
+        return chat_id.startswith("@") or chat_id.startswith("-")
+    return isinstance(chat_id, int) and chat_id < 0
+
+def _retry_delay(error):
+    """Seconds to wait from a RetryAfter, whichever type this PTB version uses."""
+    try:
+        value = error._retry_after
+    except AttributeError:
+        value = error.retry_after
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+class LaneStats:
+    __slots__ = ("queued", "requests", "wait_total", "wait_max")
+
+    def __init__(self):
+        self.queued = 0
+        self.requests = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+class OutboundGateway(BaseRateLimiter):
+    """Rate limiter that releases outgoing Bot API calls by priority lane.
+
+    A global token bucket bounds the rate of channel posts and bulk sends;
+    when it runs dry, waiting calls are released lowest lane first. Callback
+    answers and private replies never wait for it: they are bounded by the
+    incoming updates already, and queueing them behind broadcasts would stall
+    every user. They still take a token when one is free, so bulk sends slow
+    down while users are active. Group and channel chats also get a minimum
+    interval between posts. RetryAfter pauses all lanes once and the call is
+    retried, instead of every handler dealing with it.
+    """
+
+    def __init__(self, rate=GATEWAY_GLOBAL_RATE, burst=GATEWAY_GLOBAL_BURST,
+                 group_chat_interval=GATEWAY_GROUP_CHAT_INTERVAL, max_retries=GATEWAY_MAX_RETRIES):
+        self.rate = rate
+        self.burst = burst
+        self.group_chat_interval = group_chat_interval
+        self.max_retries = max_retries
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._counter = itertools.count()
+        self._chat_next_slot = {}
+        self._wakeup = None
+        self._dispatcher = None
+
+        self.lanes = {priority: LaneStats() for priority in LANE_NAMES}
+        self.retries = 0
+
+    async def initialize(self) -> None:
+        # Bot.initialize and Application.initialize may both call this
+        if self._dispatcher is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        for _, _, future in self._waiters:
+            if not future.done():
+                future.cancel()
+        self._waiters.clear()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def _dispatch(self):
+        """Hand out tokens to queued calls in priority order."""
+        while True:
+            if not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+
+            self._refill(now)
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # The caller was cancelled while waiting
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+    async def _acquire(self, priority):
+        now = time.monotonic()
+        if priority not in GLOBAL_LANES:
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+            return
+
+        if not self._waiters and now >= self._paused_until:
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._wakeup.set()
+        await future
+
+    async def _wait_for_chat(self, chat_id):
+        """Space out posts to the same group or channel."""
+        now = time.monotonic()
+        slot = max(now, self._chat_next_slot.get(chat_id, 0.0))
+        self._chat_next_slot[chat_id] = slot + self.group_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _priority(self, endpoint, data, rate_limit_args):
+        if isinstance(rate_limit_args, int):
+            return rate_limit_args
+        if endpoint in INTERACTIVE_ENDPOINTS:
+            return PRIORITY_INTERACTIVE
+        if is_group_chat(data.get("chat_id")):
+            return PRIORITY_CHANNEL
+        return PRIORITY_REPLY
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        priority = self._priority(endpoint, data, rate_limit_args)
+        lane = self.lanes.setdefault(priority, LaneStats())
+        chat_id = data.get("chat_id")
+
+        started = time.monotonic()
+        lane.queued += 1
+        try:
+            if priority != PRIORITY_INTERACTIVE and is_group_chat(chat_id):
+                await self._wait_for_chat(chat_id)
+            await self._acquire(priority)
+        finally:
+            lane.queued -= 1
+
+        waited = time.monotonic() - started
+        lane.requests += 1
+        lane.wait_total += waited
+        lane.wait_max = max(lane.wait_max, waited)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = _retry_delay(e)
+                self.retries += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(f"Flood control on {endpoint}, pausing outbound calls for {delay:.1f}s")
+                await self._acquire(priority)
+
+    def stats(self):
+        """Queue depth and wait times per lane."""
+        lanes = {}
+        for priority, lane in sorted(self.lanes.items()):
+            lanes[LANE_NAMES.get(priority, str(priority))] = {
+                "queued": lane.queued,
+                "requests": lane.requests,
+                "avg_wait_ms": lane.wait_total / lane.requests * 1000 if lane.requests else 0.0,
+                "max_wait_ms": lane.wait_max * 1000,
+            }
+        return {
+            "lanes": lanes,
+            "retries": self.retries,
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+        }
+
+# The gateway of the running application (set by configure_builder)
+outbound_gateway = None
+
+def configure_builder(builder: ApplicationBuilder) -> ApplicationBuilder:
+    """Install the pooled HTTP client and the outbound gateway on a builder."""
+    global outbound_gateway
+    outbound_gateway = OutboundGateway()
+
+    socket_options = [(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1), (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    request = HTTPXRequest(
+        connection_pool_size=GATEWAY_POOL_SIZE,
+        pool_timeout=GATEWAY_POOL_TIMEOUT,
+        read_timeout=GATEWAY_READ_TIMEOUT,
+        connect_timeout=GATEWAY_CONNECT_TIMEOUT,
+        socket_options=socket_options
+    )
+    # getUpdates long-polls, so it gets its own small pool and never holds a send connection
+    get_updates_request = HTTPXRequest(
+        connection_pool_size=1,
+        connect_timeout=GATEWAY_CONNECT_TIMEOUT,
+        socket_options=socket_options
+    )
+
+    return (
+        builder
+        .request(request)
+        .get_updates_request(get_updates_request)
+        .rate_limiter(outbound_gateway)
+    )
+
+def get_gateway_stats():
+    """Return the outbound gateway statistics, or None if it is not installed."""
+    return outbound_gateway.stats() if outbound_gateway else None
@@ -1,34 +1,65 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from telegram.constants import ParseMode
+from edits import edit_message, edit_markup
 import logging
-from config import SEARCH_QUERY
+from config import SEARCH_QUERY, FEED_PAGE_SIZE
 from database import (
-    load_data, get_anime_by_id, register_user, is_vip, search_anime
+    get_anime_by_id, get_episode, register_user, is_vip, is_admin, search_anime,
+    released_animes, is_released
 )
+from deeplinks import resolve_payload
+from views import record_view, get_trending
+from progress import record_progress, get_last_watched
+from render import render_caption, render_message
+from parallel import run_concurrently
+from facets import facet_index
+from subscriptions import is_subscribed, toggle_subscription
+from feed import count_releases, latest_releases
 
-# Enable logging
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
-)
 logger = logging.getLogger(__name__)
 
-async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Send a message when the command /start is issued."""
-    user = update.effective_user
-    register_user(user)
+def main_menu_keyboard(user_id: int) -> InlineKeyboardMarkup:
+    """Build the main menu for a user."""
+    keyboard = []
+    
+    # Resume button only for users with watch progress
+    if get_last_watched(user_id):
+        keyboard.append([InlineKeyboardButton("▶️ Davom ettirish", callback_data="resume")])
     
-    keyboard = [
+    keyboard += [
         [InlineKeyboardButton("🔍 Anime qidirish", callback_data="search")],
         [InlineKeyboardButton("📋 Animelar ro'yxati", callback_data="anime_list")],
+        [InlineKeyboardButton("🆕 Yangi qismlar", callback_data="latest")],
+        [InlineKeyboardButton("🔥 Trending", callback_data="trending")],
+        [InlineKeyboardButton("🎭 Janrlar", callback_data="browse")],
         [InlineKeyboardButton("👑 VIP", callback_data="vip_info")]
     ]
     
-    from database import is_admin
-    if is_admin(user.id):
+    if is_admin(user_id):
         keyboard.append([InlineKeyboardButton("⚙️ Admin panel", callback_data="admin_panel")])
     
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    return InlineKeyboardMarkup(keyboard)
+
+async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Send a message when the command /start is issued.
+
+    "/start ANM001" and "/start ANM001-5" (links from channel posts) open the
+    anime or the episode straight away instead of the main menu.
+    """
+    user = update.effective_user
+    register_user(user)
+    
+    if context.args:
+        anime, episode_num = resolve_payload(context.args[0])
+        if anime is not None:
+            if episode_num is None:
+                await show_anime_details(update, context, anime["id"])
+            else:
+                await show_episode(update, context, anime["id"], episode_num)
+            return
+    
+    reply_markup = main_menu_keyboard(user.id)
     
     await update.message.reply_text(
         f"Assalomu alaykum, {user.first_name}! Anime ko'rish botiga xush kelibsiz!",
@@ -49,7 +80,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 async def search_anime_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Start the search process."""
     if update.callback_query:
-        await update.callback_query.edit_message_text(
+        await edit_message(update.callback_query,
             "Qidirish uchun anime nomini yoki kodini kiriting:",
             parse_mode=ParseMode.HTML
         )
@@ -96,14 +127,14 @@ async def list_animes_command(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def list_animes(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 1) -> None:
     """Show list of animes."""
-    data = load_data()
+    animes = released_animes()
     
-    if not data["animes"]:
+    if not animes:
         if update.callback_query:
             keyboard = [[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")]]
             reply_markup = InlineKeyboardMarkup(keyboard)
             
-            await update.callback_query.edit_message_text(
+            await edit_message(update.callback_query,
                 "Animelar ro'yxati bo'sh.",
                 reply_markup=reply_markup
             )
@@ -119,7 +150,7 @@ async def list_animes(update: Update, context: ContextTypes.DEFAULT_TYPE, page:
     
     # Pagination
     items_per_page = 5
-    total_pages = (len(data["animes"]) + items_per_page - 1) // items_per_page
+    total_pages = (len(animes) + items_per_page - 1) // items_per_page
     
     if page < 1:
         page = 1
@@ -127,10 +158,10 @@ async def list_animes(update: Update, context: ContextTypes.DEFAULT_TYPE, page:
         page = total_pages
     
     start_idx = (page - 1) * items_per_page
-    end_idx = min(start_idx + items_per_page, len(data["animes"]))
+    end_idx = min(start_idx + items_per_page, len(animes))
     
     keyboard = []
-    for anime in data["animes"][start_idx:end_idx]:
+    for anime in animes[start_idx:end_idx]:
         keyboard.append([InlineKeyboardButton(f"{anime['name']} ({anime['id']})", callback_data=f"anime_{anime['id']}")])
     
     # Pagination buttons
@@ -146,10 +177,10 @@ async def list_animes(update: Update, context: ContextTypes.DEFAULT_TYPE, page:
     keyboard.append([InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")])
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    message = f"Animelar ro'yxati ({start_idx+1}-{end_idx} / {len(data['animes'])}):"
+    message = f"Animelar ro'yxati ({start_idx+1}-{end_idx} / {len(animes)}):"
     
     if update.callback_query:
-        await update.callback_query.edit_message_text(
+        await edit_message(update.callback_query,
             message,
             reply_markup=reply_markup
         )
@@ -159,28 +190,20 @@ async def list_animes(update: Update, context: ContextTypes.DEFAULT_TYPE, page:
             reply_markup=reply_markup
         )
 
-async def show_anime_details(update: Update, context: ContextTypes.DEFAULT_TYPE, anime_id: str) -> None:
-    """Show anime details."""
-    query = update.callback_query
-    anime = get_anime_by_id(anime_id)
-
-    if not anime:
-        await query.edit_message_text(
-            "Anime topilmadi.",
-            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")]])
-        )
-        return
-
-    # Check if VIP
-    is_user_vip = is_vip(query.from_user.id)
-
+def anime_details_keyboard(anime, user_id: int) -> InlineKeyboardMarkup:
+    """Episode buttons, the subscribe toggle and the back button of an anime."""
+    is_user_vip = is_vip(user_id)
+    anime_id = anime["id"]
+    
     # Create episode buttons
     keyboard = []
     episode_buttons = []
     
     if anime.get("episodes"):
-        # Sort episodes by number
-        sorted_episodes = sorted(anime["episodes"], key=lambda x: x["number"])
+        # Sort episodes by number, leaving out scheduled ones
+        sorted_episodes = sorted(
+            (ep for ep in anime["episodes"] if is_released(ep)), key=lambda x: x["number"]
+        )
         
         # Create episode buttons in rows of 5
         for episode in sorted_episodes:
@@ -199,65 +222,107 @@ async def show_anime_details(update: Update, context: ContextTypes.DEFAULT_TYPE,
         if episode_buttons:
             keyboard.append(episode_buttons)
     
+    if is_subscribed(user_id, anime_id):
+        keyboard.append([InlineKeyboardButton("🔕 Obunani bekor qilish", callback_data=f"subscribe_{anime_id}")])
+    else:
+        keyboard.append([InlineKeyboardButton("🔔 Obuna", callback_data=f"subscribe_{anime_id}")])
+    
     # Add back button
     keyboard.append([InlineKeyboardButton("🔙 Orqaga", callback_data="anime_list")])
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    return InlineKeyboardMarkup(keyboard)
 
-    # Send anime details with image
-    vip_status = "Ha" if anime.get("vip", False) else "Yoq"
+async def toggle_subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE, anime_id: str) -> None:
+    """Subscribe to (or leave) new-episode notifications of an anime."""
+    query = update.callback_query
+    anime = get_anime_by_id(anime_id)
+    if not anime or not is_released(anime):
+        return
+    
+    toggle_subscription(query.from_user.id, anime_id)
+    
+    # Only the button changes, on the photo or text message alike
+    await edit_markup(query, anime_details_keyboard(anime, query.from_user.id))
+
+async def reply_or_edit(update: Update, text: str, **kwargs) -> None:
+    """Edit the menu message for a button press, or answer a message (deep links)."""
+    if update.callback_query:
+        await edit_message(update.callback_query, text, **kwargs)
+    else:
+        await update.message.reply_text(text, **kwargs)
+
+async def show_anime_details(update: Update, context: ContextTypes.DEFAULT_TYPE, anime_id: str) -> None:
+    """Show anime details (from a button or a /start deep link)."""
+    query = update.callback_query
+    user = update.effective_user
+    anime = get_anime_by_id(anime_id)
+
+    # Scheduled animes are only visible to admins before their release
+    if anime and not is_released(anime) and not is_admin(user.id):
+        anime = None
 
+    if not anime:
+        await reply_or_edit(update,
+            "Anime topilmadi.",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")]])
+        )
+        return
+
+    # An admin previewing a scheduled anime must not put it in Trending
+    if is_released(anime):
+        record_view(anime)
+    reply_markup = anime_details_keyboard(anime, user.id)
+
+    # Send anime details with image
     if anime.get("image_id"):
-        await query.message.reply_photo(
+        photo = (query.message if query else update.message).reply_photo(
             photo=anime["image_id"],
-            caption=(f"📺 <b>{anime['name']}</b> ({anime['id']})\n\n"
-                   f"📝 <b>Tavsif:</b>\n{anime['description']}\n\n"
-                   f"🔍 <b>Kod:</b> {anime.get('code', 'N/A')}\n"
-                   f"👑 <b>VIP:</b> {vip_status}\n"
-                   f"🎬 <b>Epizodlar soni:</b> {len(anime.get('episodes', []))}"),
+            caption=render_caption("details", anime),
             parse_mode=ParseMode.HTML,
             reply_markup=reply_markup
         )
-        await query.edit_message_text("Anime ma'lumotlari yuborildi.")
+        if query:
+            # The photo and the edit are independent, so send them together
+            await run_concurrently(photo, edit_message(query, "Anime ma'lumotlari yuborildi."))
+        else:
+            await photo
     else:
-        await query.edit_message_text(
-            (f"📺 <b>{anime['name']}</b> ({anime['id']})\n\n"
-            f"📝 <b>Tavsif:</b>\n{anime['description']}\n\n"
-            f"🔍 <b>Kod:</b> {anime.get('code', 'N/A')}\n"
-            f"👑 <b>VIP:</b> {vip_status}\n"
-            f"🎬 <b>Epizodlar soni:</b> {len(anime.get('episodes', []))}"),
+        await reply_or_edit(update,
+            render_message("details", anime),
             parse_mode=ParseMode.HTML,
             reply_markup=reply_markup
         )
 
 async def show_episode(update: Update, context: ContextTypes.DEFAULT_TYPE, anime_id: str, episode_num: int) -> None:
-    """Show episode video."""
+    """Show episode video (from a button or a /start deep link)."""
     query = update.callback_query
+    user = update.effective_user
     anime = get_anime_by_id(anime_id)
     
+    if anime and not is_released(anime):
+        anime = None
+    
     if not anime:
-        await query.edit_message_text(
+        await reply_or_edit(update,
             "Anime topilmadi.",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")]])
         )
         return
     
     # Find episode
-    episode = None
-    for ep in anime.get("episodes", []):
-        if ep["number"] == episode_num:
-            episode = ep
-            break
+    episode = get_episode(anime, episode_num)
+    if episode and not is_released(episode):
+        episode = None
     
     if not episode:
-        await query.edit_message_text(
+        await reply_or_edit(update,
             "Epizod topilmadi.",
             reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data=f"anime_{anime_id}")]])
         )
         return
     
     # Check if VIP
-    if anime.get("vip", False) and not is_vip(query.from_user.id):
-        await query.edit_message_text(
+    if anime.get("vip", False) and not is_vip(user.id):
+        await reply_or_edit(update,
             "Bu anime faqat VIP foydalanuvchilar uchun.",
             reply_markup=InlineKeyboardMarkup([
                 [InlineKeyboardButton("👑 VIP haqida", callback_data="vip_info")],
@@ -272,7 +337,7 @@ async def show_episode(update: Update, context: ContextTypes.DEFAULT_TYPE, anime
     # Previous episode button
     prev_episode = None
     for ep in anime.get("episodes", []):
-        if ep["number"] < episode_num and (prev_episode is None or ep["number"] > prev_episode["number"]):
+        if is_released(ep) and ep["number"] < episode_num and (prev_episode is None or ep["number"] > prev_episode["number"]):
             prev_episode = ep
     
     if prev_episode:
@@ -281,7 +346,7 @@ async def show_episode(update: Update, context: ContextTypes.DEFAULT_TYPE, anime
     # Next episode button
     next_episode = None
     for ep in anime.get("episodes", []):
-        if ep["number"] > episode_num and (next_episode is None or ep["number"] < next_episode["number"]):
+        if is_released(ep) and ep["number"] > episode_num and (next_episode is None or ep["number"] < next_episode["number"]):
             next_episode = ep
     
     if next_episode:
@@ -297,15 +362,191 @@ async def show_episode(update: Update, context: ContextTypes.DEFAULT_TYPE, anime
         [InlineKeyboardButton("🔙 Orqaga", callback_data=f"anime_{anime_id}")]
     ])
     
+    record_view(anime, episode_num)
+    record_progress(user.id, anime_id, episode_num)
+    
     # Send video
-    await query.message.reply_video(
+    video = (query.message if query else update.message).reply_video(
         video=episode["url"],
-        caption=f"📺 <b>{anime['name']}</b> - {episode_num}-qism",
+        caption=render_caption("episode", anime, episode=episode_num),
         parse_mode=ParseMode.HTML,
         reply_markup=reply_markup
     )
+    if query:
+        await run_concurrently(video, edit_message(query, "Epizod yuborildi."))
+    else:
+        await video
+
+async def show_browse(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 1) -> None:
+    """Browse animes by genre, optionally only VIP or completed ones."""
+    query = update.callback_query
+    filters = context.user_data.setdefault("browse", {"genres": [], "vip": False, "completed": False})
+    index = facet_index()
+    
+    # Genres that disappeared from the catalog can no longer be selected
+    filters["genres"] = [key for key in filters["genres"] if key in index.genres]
+    
+    mask = index.query(filters["genres"], filters["vip"], filters["completed"])
+    total = mask.bit_count()
+    
+    items_per_page = 5
+    total_pages = max(1, (total + items_per_page - 1) // items_per_page)
+    page = max(1, min(page, total_pages))
+    animes = index.page(mask, (page - 1) * items_per_page, items_per_page)
+    
+    keyboard = []
+    
+    # Genre toggles, two per row, most used first
+    row = []
+    for key, name, count in index.genre_list()[:20]:
+        mark = "✅ " if key in filters["genres"] else ""
+        row.append(InlineKeyboardButton(f"{mark}{name} ({count})", callback_data=f"browse_g_{key}"))
+        if len(row) == 2:
+            keyboard.append(row)
+            row = []
+    if row:
+        keyboard.append(row)
+    
+    keyboard.append([
+        InlineKeyboardButton(f"{'✅ ' if filters['vip'] else ''}👑 Faqat VIP", callback_data="browse_vip"),
+        InlineKeyboardButton(f"{'✅ ' if filters['completed'] else ''}🏁 Tugallangan", callback_data="browse_completed")
+    ])
+    
+    for anime in animes:
+        keyboard.append([InlineKeyboardButton(f"{anime['name']} ({anime['id']})", callback_data=f"anime_{anime['id']}")])
+    
+    pagination = []
+    if page > 1:
+        pagination.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=f"browse_page_{page-1}"))
+    if page < total_pages:
+        pagination.append(InlineKeyboardButton("Keyingi ➡️", callback_data=f"browse_page_{page+1}"))
+    if pagination:
+        keyboard.append(pagination)
+    
+    keyboard.append([
+        InlineKeyboardButton("🧹 Tozalash", callback_data="browse_clear"),
+        InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")
+    ])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    selected = ", ".join(index.names[key] for key in filters["genres"]) or "barchasi"
+    message = f"🎭 Janrlar: {selected}\nTopildi: {total}"
+    if total:
+        message += f" (sahifa {page}/{total_pages})"
+    
+    await edit_message(query, message, reply_markup=reply_markup)
+
+async def browse_action(update: Update, context: ContextTypes.DEFAULT_TYPE, action: str) -> None:
+    """Apply a browse button (browse_g_<genre>, browse_vip, browse_completed, browse_clear, browse_page_<n>)."""
+    filters = context.user_data.setdefault("browse", {"genres": [], "vip": False, "completed": False})
+    page = 1
+    
+    if action.startswith("browse_g_"):
+        key = action[len("browse_g_"):]
+        if key in filters["genres"]:
+            filters["genres"].remove(key)
+        else:
+            filters["genres"].append(key)
+    elif action == "browse_vip":
+        filters["vip"] = not filters["vip"]
+    elif action == "browse_completed":
+        filters["completed"] = not filters["completed"]
+    elif action == "browse_clear":
+        context.user_data.pop("browse", None)
+    elif action.startswith("browse_page_"):
+        page = int(action.split("_")[2])
+    
+    await show_browse(update, context, page)
+
+async def show_latest(update: Update, context: ContextTypes.DEFAULT_TYPE, page: int = 1) -> None:
+    """Show the newest releases from the release feed, one page at a time."""
+    query = update.callback_query
+    total = count_releases()
+    total_pages = max(1, (total + FEED_PAGE_SIZE - 1) // FEED_PAGE_SIZE)
+    page = min(max(page, 1), total_pages)
+    
+    # Only this page's entries are read, each with one id lookup
+    is_user_vip = None
+    keyboard = []
+    for anime_id, episode_number, released_at in latest_releases((page - 1) * FEED_PAGE_SIZE, FEED_PAGE_SIZE):
+        anime = get_anime_by_id(anime_id)
+        if not anime or not is_released(anime):
+            continue
+        if episode_number is None:
+            keyboard.append([InlineKeyboardButton(f"📺 {anime['name']} - yangi anime", callback_data=f"anime_{anime_id}")])
+            continue
+        if is_user_vip is None:
+            is_user_vip = is_vip(query.from_user.id)
+        lock = "🔒 " if anime.get("vip", False) and not is_user_vip else ""
+        keyboard.append([InlineKeyboardButton(
+            f"{lock}🎬 {anime['name']} - {episode_number}-qism",
+            callback_data=f"episode_{anime_id}_{episode_number}"
+        )])
+    
+    # Pagination buttons
+    pagination = []
+    if page > 1:
+        pagination.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=f"latest_page_{page-1}"))
+    if page < total_pages:
+        pagination.append(InlineKeyboardButton("Keyingi ➡️", callback_data=f"latest_page_{page+1}"))
+    if pagination:
+        keyboard.append(pagination)
+    
+    keyboard.append([InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    if total:
+        message = f"🆕 <b>Yangi qismlar</b> ({page}/{total_pages})"
+    else:
+        message = "🆕 Hozircha yangi qismlar yo'q."
+    
+    await edit_message(query,
+        message,
+        parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup
+    )
+
+async def show_trending(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Show the most viewed animes of the trending window."""
+    query = update.callback_query
+    # Views counted before an anime was deleted or (re)scheduled stay in the window
+    trending = []
+    for entry in get_trending():
+        anime = get_anime_by_id(entry[0])
+        if anime and is_released(anime):
+            trending.append(entry)
+    
+    keyboard = []
+    for place, (anime_id, name, views) in enumerate(trending, start=1):
+        keyboard.append([InlineKeyboardButton(f"{place}. {name} - 👁 {views}", callback_data=f"anime_{anime_id}")])
+    keyboard.append([InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")])
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    if trending:
+        message = "🔥 <b>Trending animelar</b>\n\nSo'nggi kunlarda eng ko'p ko'rilganlar:"
+    else:
+        message = "🔥 Hozircha trending animelar yo'q."
+    
+    await edit_message(query,
+        message,
+        parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup
+    )
+
+async def resume_watching(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Jump straight to the user's last watched episode."""
+    query = update.callback_query
+    last = get_last_watched(query.from_user.id)
+    
+    if not last:
+        await edit_message(query,
+            "Siz hali hech narsa ko'rmagansiz.",
+            reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")]])
+        )
+        return
     
-    await query.edit_message_text("Epizod yuborildi.")
+    anime_id, episode_num = last
+    await show_episode(update, context, anime_id, episode_num)
 
 async def vip_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show VIP information."""
@@ -329,7 +570,7 @@ async def vip_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     keyboard = [[InlineKeyboardButton("🔙 Orqaga", callback_data="back_to_main")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await query.edit_message_text(
+    await edit_message(query,
         message,
         parse_mode=ParseMode.HTML,
         reply_markup=reply_markup
@@ -0,0 +1,350 @@
+"""End-to-end load test of bot.py against the local fake Bot API server.
+
+Virtual users replay a mix of /start, channel deep links, search, list paging,
+anime detail and episode clicks. Updates go through the real getUpdates polling
+loop and the real Application built by bot.build_application(), and the driver
+reports throughput and p50/p99 latency (update queued -> all handlers finished).
+
+With --broadcast N, N bulk-lane messages are queued at the start (like a
+new-episode notification fan-out) and the run fails if callback answers or
+replies had to wait behind them in the outbound gateway.
+
+Example:
+    python loadtest.py --users 2000 --actions 5 --latency 0.02 --error-rate 0.01
+    python loadtest.py --users 200 --broadcast 300
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from telegram.ext import Application
+
+from fake_bot_api import BOT_USER, FakeBotAPI
+
+# Relative weights of the actions a virtual user takes after /start
+ACTION_WEIGHTS = {
+    "list": 3,
+    "page": 2,
+    "anime": 4,
+    "episode": 4,
+    "search": 2,
+    "trending": 1,
+    "latest": 2,
+    "resume": 1,
+    "browse": 2,
+    "deeplink": 2,
+}
+
+GENRES = ["Jangari", "Romantika", "Komediya", "Fantastika", "Drama", "Sport"]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+def make_catalog(anime_count, episodes_per_anime):
+    """Build synthetic data.json / users.json contents."""
+    animes = []
+    for i in range(1, anime_count + 1):
+        animes.append({
+            "id": f"ANM{i:03d}",
+            "name": f"Test anime {i}",
+            "description": f"Yuklama testi uchun anime #{i}",
+            "code": f"test{i}",
+            "image_id": f"photo{i}" if i % 2 else "",
+            "video_id": "",
+            "genres": [GENRES[i % len(GENRES)], GENRES[(i * 7) % len(GENRES)]],
+            "completed": i % 3 == 0,
+            "vip": False,
+            "episodes": [
+                {"number": n, "url": f"video{i}_{n}"}
+                for n in range(1, episodes_per_anime + 1)
+            ],
+        })
+    return {"animes": animes}, {"users": []}
+
+
+class VirtualUser:
+    """Generates the update payloads of one simulated user session."""
+
+    def __init__(self, user_id, catalog, rng):
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}",
+                     "username": f"user{user_id}"}
+        self.chat = {"id": user_id, "type": "private", "first_name": self.user["first_name"]}
+        self.catalog = catalog
+        self.rng = rng
+        self.message_id = 0
+
+    def _message(self, text, command=False):
+        self.message_id += 1
+        message = {
+            "message_id": self.message_id,
+            "date": int(time.time()),
+            "chat": self.chat,
+            "from": self.user,
+            "text": text,
+        }
+        if command:
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"message": message}
+
+    def _callback(self, data):
+        # Buttons are pressed on the same menu message the bot keeps editing
+        self.message_id += 1
+        return {"callback_query": {
+            "id": f"{self.user['id']}-{self.message_id}",
+            "from": self.user,
+            "chat_instance": str(self.user["id"]),
+            "data": data,
+            "message": {
+                "message_id": 1,
+                "date": int(time.time()),
+                "chat": self.chat,
+                "from": BOT_USER,
+                "text": "...",
+            },
+        }}
+
+    def session(self, actions):
+        """Yield (kind, payload) pairs in the order the user sends them."""
+        animes = self.catalog["animes"]
+        pages = max(1, (len(animes) + 4) // 5)
+        kinds = list(ACTION_WEIGHTS)
+        weights = list(ACTION_WEIGHTS.values())
+
+        yield "start", self._message("/start", command=True)
+        for kind in self.rng.choices(kinds, weights, k=actions):
+            anime = self.rng.choice(animes)
+            if kind == "list":
+                yield kind, self._callback("anime_list")
+            elif kind == "page":
+                yield kind, self._callback(f"page_{self.rng.randint(1, pages)}")
+            elif kind == "anime":
+                yield kind, self._callback(f"anime_{anime['id']}")
+            elif kind == "episode":
+                episode = self.rng.choice(anime["episodes"])
+                yield kind, self._callback(f"episode_{anime['id']}_{episode['number']}")
+            elif kind == "resume":
+                yield kind, self._callback("resume")
+            elif kind == "trending":
+                yield kind, self._callback("trending")
+            elif kind == "latest":
+                yield kind, self._callback(self.rng.choice(["latest", "latest_page_2"]))
+            elif kind == "browse":
+                yield kind, self._callback(self.rng.choice(
+                    ["browse", "browse_completed", "browse_page_2"] +
+                    [f"browse_g_{genre.casefold()}" for genre in GENRES]
+                ))
+            elif kind == "deeplink":
+                # A viewer arriving from a channel post link
+                episode = self.rng.choice(anime["episodes"])
+                yield kind, self._message(f"/start {anime['id']}-{episode['number']}", command=True)
+            elif kind == "search":
+                yield "search", self._callback("search")
+                yield "search_query", self._message(self.rng.choice([anime["code"], anime["name"][-2:]]))
+
+
+def interleave(sessions, rng):
+    """Merge per-user sessions randomly while keeping each user's order."""
+    active = [iter(s) for s in sessions]
+    while active:
+        index = rng.randrange(len(active))
+        try:
+            yield next(active[index])
+        except StopIteration:
+            active[index] = active[-1]
+            active.pop()
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    data, users = make_catalog(args.animes, args.episodes)
+
+    # Work on a throwaway copy of the data files
+    workdir = tempfile.mkdtemp(prefix="bot-loadtest-")
+    os.chdir(workdir)
+    with open("data.json", "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    with open("users.json", "w", encoding="utf-8") as f:
+        json.dump(users, f)
+    with open("feed.json", "w", encoding="utf-8") as f:
+        # The last episode of every anime, as if each had just been released
+        json.dump([[a["id"], a["episodes"][-1]["number"], 0] for a in data["animes"] if a["episodes"]], f)
+
+    server = FakeBotAPI(
+        latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, retry_after=args.retry_after, seed=args.seed,
+    ).start()
+
+    # Imported here so bot modules pick up the temporary working directory
+    from bot import build_application
+    from logs import setup_logging
+    setup_logging()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    builder = (
+        Application.builder()
+        .token("123456:LOADTEST")
+        .base_url(server.base_url)
+        .base_file_url(server.base_file_url)
+    )
+    if args.concurrent_updates > 1:
+        builder = builder.concurrent_updates(args.concurrent_updates)
+    application = build_application(builder)
+
+    queued = {}
+    latencies = defaultdict(list)
+    done = asyncio.Event()
+    expected = 0
+
+    process_update = application.process_update
+
+    async def timed_process_update(update):
+        # Wraps the whole handler chain, so updates dropped early still count
+        try:
+            await process_update(update)
+        finally:
+            kind, started = queued.pop(update.update_id, (None, None))
+            if kind is not None:
+                latencies[kind].append(time.perf_counter() - started)
+            if sum(len(v) for v in latencies.values()) >= expected:
+                done.set()
+
+    application.process_update = timed_process_update
+
+    sessions = [
+        VirtualUser(100000 + i, data, random.Random(rng.random())).session(args.actions)
+        for i in range(args.users)
+    ]
+    plan = list(interleave(sessions, rng))
+    expected = len(plan)
+
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+
+        from gateway import PRIORITY_BULK
+        broadcast = [
+            asyncio.create_task(application.bot.send_message(
+                chat_id=900000 + i, text="Yangi qism!", rate_limit_args=PRIORITY_BULK
+            ))
+            for i in range(args.broadcast)
+        ]
+
+        started = time.perf_counter()
+        interval = 1 / args.rate if args.rate else 0
+        for i, (kind, payload) in enumerate(plan):
+            if interval:
+                delay = started + i * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            # No await in between, so polling cannot pick it up before it is recorded
+            update_id = server.push_update(payload)
+            queued[update_id] = (kind, time.perf_counter())
+
+        try:
+            await asyncio.wait_for(done.wait(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+
+        for task in broadcast:
+            task.cancel()
+        await asyncio.gather(*broadcast, return_exceptions=True)
+        await application.updater.stop()
+        await application.stop()
+    server.stop()
+
+    if not report(args, plan, latencies, elapsed, server, len(queued)):
+        sys.exit(1)
+
+
+def report(args, plan, latencies, elapsed, server, unfinished):
+    """Print the results; False if a --broadcast run held user traffic back."""
+    all_latencies = [v for values in latencies.values() for v in values]
+    completed = len(all_latencies)
+
+    print(f"\n=== Load test {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===")
+    print(f"virtual users:  {args.users}")
+    print(f"updates sent:   {len(plan)}")
+    print(f"completed:      {completed} (unfinished: {unfinished})")
+    print(f"elapsed:        {elapsed:.2f}s")
+    print(f"throughput:     {completed / elapsed if elapsed else 0:.1f} updates/s")
+    print(f"latency p50:    {percentile(all_latencies, 50) * 1000:.1f} ms")
+    print(f"latency p99:    {percentile(all_latencies, 99) * 1000:.1f} ms")
+
+    print("\nper action:          count     p50 ms     p99 ms")
+    for kind, values in sorted(latencies.items()):
+        print(f"  {kind:<16} {len(values):>8} {percentile(values, 50) * 1000:>10.1f} "
+              f"{percentile(values, 99) * 1000:>10.1f}")
+
+    from antiflood import get_flood_stats
+    flood = get_flood_stats()
+    print(f"anti-flood:     {flood.get('throttled', 0)} throttled, {flood.get('coalesced', 0)} coalesced")
+
+    from edits import get_edit_stats
+    edits = get_edit_stats()
+    print(f"edits:          {edits.get('full', 0)} full, {edits.get('markup_only', 0)} markup only, "
+          f"{edits.get('skipped', 0)} skipped")
+
+    from gateway import get_gateway_stats
+    gateway = get_gateway_stats()
+    if gateway:
+        print(f"gateway:        {gateway['retries']} RetryAfter retries")
+        for lane, lane_stats in gateway["lanes"].items():
+            print(f"  {lane:<16} {lane_stats['requests']:>8} calls, avg wait {lane_stats['avg_wait_ms']:.1f} ms, "
+                  f"max {lane_stats['max_wait_ms']:.1f} ms")
+
+    print("\nBot API calls:       count   429s")
+    for method, count in sorted(server.calls.items()):
+        print(f"  {method:<18} {count:>8} {server.throttled[method]:>6}")
+
+    if args.broadcast and gateway and not gateway["retries"]:
+        # Without RetryAfter pauses, user-facing lanes should not wait at all
+        from config import GATEWAY_GLOBAL_RATE
+        limit = 1000 / GATEWAY_GLOBAL_RATE
+        held = {
+            lane: lane_stats["max_wait_ms"] for lane, lane_stats in gateway["lanes"].items()
+            if lane in ("interactive", "reply") and lane_stats["max_wait_ms"] >= limit
+        }
+        if held:
+            print(f"\nFAIL: user traffic waited behind {args.broadcast} bulk sends: "
+                  + ", ".join(f"{lane} {wait:.1f} ms" for lane, wait in held.items()))
+            return False
+        print(f"\nOK: user traffic never waited behind {args.broadcast} bulk sends")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="number of virtual users")
+    parser.add_argument("--actions", type=int, default=5, help="actions per user after /start")
+    parser.add_argument("--rate", type=float, default=0, help="updates per second (0 = as fast as possible)")
+    parser.add_argument("--animes", type=int, default=50, help="catalog size")
+    parser.add_argument("--episodes", type=int, default=12, help="episodes per anime")
+    parser.add_argument("--latency", type=float, default=0.01, help="fake API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="retry_after sent with injected 429s")
+    parser.add_argument("--concurrent-updates", type=int, default=1, help="Application concurrent_updates")
+    parser.add_argument("--broadcast", type=int, default=0, help="bulk sends queued alongside the load")
+    parser.add_argument("--timeout", type=float, default=600, help="give up waiting after this many seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import atexit
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime
+from config import LOG_LEVEL, LOG_FILE, LOG_SAMPLE_RATES
+
+# Fields of the update being handled, set around every handler callback
+_update_context = contextvars.ContextVar("update_context", default={})
+
+# (pid, listener) of the running setup; a forked worker needs its own listener
+_listener = (None, None)
+
+class UpdateContextFilter(logging.Filter):
+    """Copy the current update id, user id and handler name onto the record."""
+
+    def filter(self, record):
+        fields = _update_context.get()
+        record.update_id = fields.get("update_id")
+        record.user_id = fields.get("user_id")
+        record.handler = fields.get("handler")
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Keep only a share of INFO and lower records from noisy loggers.
+
+    rates maps a logger name (it also covers its children, the longest
+    match wins) to the share kept, e.g. {"httpx": 0.05}. Warnings and
+    errors always pass, and kept records note their rate so counts can be
+    scaled back up.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._cache = {}  # logger name -> rate
+
+    def _rate(self, name):
+        rate = self._cache.get(name)
+        if rate is None:
+            matches = [p for p in self.rates if name == p or name.startswith(p + ".")]
+            rate = self.rates[max(matches, key=len)] if matches else 1.0
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        rate = 1.0 if record.levelno > logging.INFO else self._rate(record.name)
+        record.sample_rate = rate
+        return rate >= 1.0 or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("update_id", "user_id", "handler"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if getattr(record, "sample_rate", 1.0) < 1.0:
+            entry["sample_rate"] = record.sample_rate
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Render the message and traceback on the caller's side, leave the rest as fields."""
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        record.stack_info = None
+        return record
+
+def setup_logging(level=LOG_LEVEL, path=LOG_FILE, sample_rates=LOG_SAMPLE_RATES):
+    """Route all logging through a queue to a background writer thread.
+
+    The event loop only puts records on an in-memory queue; a
+    QueueListener thread formats them as JSON and writes them to path (or
+    stderr). Safe to call again: a second call in the same process does
+    nothing, and a forked worker starts its own listener.
+    """
+    global _listener
+    pid, listener = _listener
+    if pid == os.getpid():
+        return
+    if listener is not None:
+        # Inherited from the parent over fork; its thread does not exist here
+        logging.getLogger().handlers.clear()
+
+    if path:
+        output = logging.handlers.WatchedFileHandler(path, encoding="utf-8")
+    else:
+        output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter())
+
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(SamplingFilter(sample_rates))
+    handler.addFilter(UpdateContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(records, output)
+    listener.start()
+    atexit.register(listener.stop)
+    _listener = (os.getpid(), listener)
+
+def with_update_context(callback):
+    """Wrap a handler callback so log records made while it runs carry the update."""
+    @functools.wraps(callback)
+    async def wrapper(update, context, *args, **kwargs):
+        user = getattr(update, "effective_user", None)
+        token = _update_context.set({
+            "update_id": getattr(update, "update_id", None),
+            "user_id": user.id if user else None,
+            "handler": getattr(callback, "__name__", type(callback).__name__),
+        })
+        try:
+            return await callback(update, context, *args, **kwargs)
+        finally:
+            _update_context.reset(token)
+    return wrapper
+
+def iter_handlers(application):
+    """Every handler with a callback, including the ones inside conversations."""
+    def walk(handler):
+        if getattr(handler, "entry_points", None) is not None:
+            for state in [handler.entry_points, handler.fallbacks, *handler.states.values()]:
+                for inner in state:
+                    yield from walk(inner)
+        else:
+            yield handler
+
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            yield from walk(handler)
+
+def tag_handlers(application):
+    """Wrap the callbacks of every registered handler, conversation states included."""
+    for handler in iter_handlers(application):
+        if not getattr(handler.callback, "update_context", False):
+            handler.callback = with_update_context(handler.callback)
+            handler.callback.update_context = True
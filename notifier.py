@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+import logging
+from collections import Counter, deque
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.constants import ParseMode
+from telegram.error import Forbidden, BadRequest
+from config import NOTIFY_WORKERS
+from gateway import PRIORITY_BULK
+from render import render_message
+from subscriptions import get_subscribers, unsubscribe
+
+logger = logging.getLogger(__name__)
+
+class EpisodeNotifier:
+    """Sends new-episode messages to subscribers in the background.
+
+    notify() only appends one job (the anime, the episode and a copy of the
+    subscriber list) and returns, so the admin's upload is never held up.
+    NOTIFY_WORKERS tasks take the subscribers one at a time and send in the
+    gateway's bulk lane, which keeps the global rate limit and lets user
+    replies go first. Users who blocked the bot are unsubscribed.
+    """
+
+    def __init__(self, workers=NOTIFY_WORKERS):
+        self.worker_count = workers
+        self.stats = Counter()  # "queued", "sent", "blocked", "failed"
+        self._jobs = deque()  # (bot, anime, episode_number, iterator of user ids)
+        self._wakeup = None
+        self._workers = []
+
+    def notify(self, bot, anime, episode_number):
+        subscribers = get_subscribers(anime["id"])
+        if not subscribers:
+            return
+        self._jobs.append((bot, anime, episode_number, iter(subscribers)))
+        self.stats["queued"] += len(subscribers)
+        self._start()
+        self._wakeup.set()
+
+    def _start(self):
+        if not self._workers:
+            self._wakeup = asyncio.Event()
+            # A fresh context, or every worker log would carry the update that started them
+            self._workers = [
+                asyncio.create_task(self._work(), context=contextvars.Context())
+                for _ in range(self.worker_count)
+            ]
+
+    def _next(self):
+        """The next (bot, anime, episode_number, user_id) to send, or None."""
+        while self._jobs:
+            bot, anime, episode_number, users = self._jobs[0]
+            user_id = next(users, None)
+            if user_id is not None:
+                return bot, anime, episode_number, user_id
+            self._jobs.popleft()
+        return None
+
+    async def _work(self):
+        while True:
+            item = self._next()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._send(*item)
+
+    async def _send(self, bot, anime, episode_number, user_id):
+        self.stats["queued"] -= 1
+        keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("▶️ Ko'rish", callback_data=f"episode_{anime['id']}_{episode_number}")]
+        ])
+        try:
+            await bot.send_message(
+                chat_id=user_id,
+                text=render_message("notify_episode", anime, episode=episode_number),
+                parse_mode=ParseMode.HTML,
+                reply_markup=keyboard,
+                rate_limit_args=PRIORITY_BULK
+            )
+            self.stats["sent"] += 1
+        except Forbidden:
+            # Blocked the bot or deleted the account
+            unsubscribe(user_id, anime["id"])
+            self.stats["blocked"] += 1
+        except BadRequest as e:
+            self.stats["failed"] += 1
+            logger.warning(f"Could not notify {user_id}: {e}")
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Error notifying {user_id}: {e}")
+
+    async def stop(self):
+        """Cancel the workers; notifications still queued are dropped."""
+        if self.stats["queued"] > 0:
+            logger.warning(f"Dropping {self.stats['queued']} unsent episode notifications")
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._jobs.clear()
+        self.stats["queued"] = 0
+
+episode_notifier = EpisodeNotifier()
+
+def notify_new_episode(bot, anime, episode_number):
+    """Queue the new-episode message for the anime's subscribers."""
+    episode_notifier.notify(bot, anime, episode_number)
+
+def get_notify_stats():
+    return dict(episode_notifier.stats)
@@ -0,0 +1,26 @@
+import asyncio
+
+class CallsFailedError(Exception):
+    """Several concurrent Bot API calls failed; errors holds all of them."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__("; ".join(f"{type(e).__name__}: {e}" for e in errors))
+
+async def run_concurrently(*calls):
+    """Await independent Bot API calls together and return their results in order.
+
+    Every call runs to completion even if another fails. A single failure is
+    re-raised as is; several are raised together as CallsFailedError.
+    """
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+
+    if not errors:
+        return results
+    for error in errors:
+        if isinstance(error, asyncio.CancelledError):
+            raise error
+    if len(errors) == 1:
+        raise errors[0]
+    raise CallsFailedError(errors)
@@ -0,0 +1,89 @@
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import time
+import tracemalloc
+from config import PROFILE_MAX_SECONDS, PROFILE_TOP_ENTRIES, PROFILE_TRACEMALLOC_FRAMES
+
+logger = logging.getLogger(__name__)
+
+# Only one capture may run at a time; two profilers would skew each other
+_capture_lock = asyncio.Lock()
+
+def is_capture_running():
+    return _capture_lock.locked()
+
+def clamp_duration(seconds):
+    return max(1, min(int(seconds), PROFILE_MAX_SECONDS))
+
+async def profile_cpu(seconds):
+    """Profile the running event loop with cProfile for a limited time.
+
+    Every handler runs on the event loop thread, so enabling the profiler
+    and sleeping captures whatever the bot does during that window.
+    Returns the report as text.
+    """
+    seconds = clamp_duration(seconds)
+    async with _capture_lock:
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+
+    out = io.StringIO()
+    out.write(f"CPU profil: {elapsed:.1f}s\n\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs()
+
+    out.write("=== Eng ko'p vaqt olgan funksiyalar (cumulative) ===\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_ENTRIES)
+    out.write("\n=== O'z vaqti bo'yicha (tottime) ===\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(PROFILE_TOP_ENTRIES)
+    return out.getvalue()
+
+async def profile_memory(seconds):
+    """Diff two tracemalloc snapshots taken `seconds` apart.
+
+    Tracing is only switched on for the capture window (unless it was
+    already running) so normal operation pays no allocation overhead.
+    Returns the report as text.
+    """
+    seconds = clamp_duration(seconds)
+    async with _capture_lock:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+
+    snapshot_filter = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    )
+    before = before.filter_traces(snapshot_filter)
+    after = after.filter_traces(snapshot_filter)
+
+    out = io.StringIO()
+    out.write(f"Xotira profili: {seconds}s\n")
+    out.write(f"Joriy: {current / 1024:.1f} KiB, cho'qqi: {peak / 1024:.1f} KiB\n\n")
+
+    out.write("=== O'sish bo'yicha joylar (diff) ===\n")
+    for stat in after.compare_to(before, "lineno")[:PROFILE_TOP_ENTRIES]:
+        out.write(f"{stat}\n")
+
+    out.write("\n=== Eng katta joylar (oxirgi snapshot) ===\n")
+    for stat in after.statistics("lineno")[:PROFILE_TOP_ENTRIES]:
+        out.write(f"{stat}\n")
+    return out.getvalue()
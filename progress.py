@@ -0,0 +1,94 @@
+import logging
+import time
+from config import PROGRESS_FILE
+from storage import PendingStore
+
+logger = logging.getLogger(__name__)
+
+class ProgressStore(PendingStore):
+    """Last watched episode per (user, anime), plus each user's latest anime.
+
+    Records are [episode_number, unix_time] lists so the file stays small.
+    flush_progress writes the changes in batches from a repeating job.
+    """
+
+    def __init__(self):
+        super().__init__(PROGRESS_FILE, separators=(",", ":"))
+        self.records = {}  # user_id -> {anime_id: [episode_number, watched_at]}
+        self.latest = {}  # user_id -> anime_id
+        # pending: (user_id, anime_id, episode_number, watched_at) / (None, anime_id) to forget
+
+    def record(self, user_id, anime_id, episode_number, now=None):
+        watched_at = int(time.time() if now is None else now)
+        self.pending.append((user_id, anime_id, episode_number, watched_at))
+        self._apply(user_id, anime_id, episode_number, watched_at)
+
+    def _apply(self, user_id, anime_id, episode_number, watched_at):
+        animes = self.records.setdefault(user_id, {})
+        previous = animes.get(anime_id)
+        if previous and previous[1] > watched_at:
+            return
+        animes[anime_id] = [episode_number, watched_at]
+        latest = self.latest.get(user_id)
+        if latest is None or latest == anime_id or animes[latest][1] <= watched_at:
+            self.latest[user_id] = anime_id
+
+    def last_watched(self, user_id):
+        """Return (anime_id, episode_number) of the user's latest episode, or None."""
+        anime_id = self.latest.get(user_id)
+        if anime_id is None:
+            return None
+        return anime_id, self.records[user_id][anime_id][0]
+
+    def forget_anime(self, anime_id):
+        self.pending.append((None, anime_id))
+        self._apply_forget(anime_id)
+
+    def _apply_forget(self, anime_id):
+        for user_id, animes in self.records.items():
+            if animes.pop(anime_id, None) is not None and self.latest.get(user_id) == anime_id:
+                if animes:
+                    self.latest[user_id] = max(animes, key=lambda a: animes[a][1])
+                else:
+                    del self.latest[user_id]
+
+    def to_dict(self):
+        return {str(user_id): dict(animes) for user_id, animes in self.records.items() if animes}
+
+    def load(self, data):
+        self.records = {int(user_id): animes for user_id, animes in data.items()}
+        self.latest = {
+            user_id: max(animes, key=lambda a: animes[a][1])
+            for user_id, animes in self.records.items() if animes
+        }
+
+    def merge(self, data):
+        """Load the stored progress and replay the changes not flushed yet."""
+        changes, self.pending = self.pending, []
+        self.load(data)
+        for change in changes:
+            if change[0] is None:
+                self._apply_forget(change[1])
+            else:
+                self._apply(*change)
+
+progress_store = ProgressStore()
+
+def load_progress():
+    progress_store.reload()
+
+def record_progress(user_id, anime_id, episode_number):
+    progress_store.record(user_id, anime_id, episode_number)
+
+def get_last_watched(user_id):
+    return progress_store.last_watched(user_id)
+
+def forget_anime_progress(anime_id):
+    progress_store.forget_anime(anime_id)
+
+async def flush_progress(context=None) -> None:
+    """Write watch progress to disk if anything changed (JobQueue callback)."""
+    try:
+        progress_store.flush()
+    except OSError as e:
+        logger.error(f"Error saving watch progress: {e}")
@@ -0,0 +1,200 @@
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from datetime import datetime
+from telegram import Update
+from telegram.ext import ContextTypes
+from config import ADMIN_IDS, RECORD_DIR, RECORD_FILE_BYTES, RECORD_KEEP
+
+logger = logging.getLogger(__name__)
+
+RECORD_PREFIX = "updates-"
+RECORD_SUFFIX = ".jsonl.gz"
+
+# Keys whose value is a user or chat object, or a list of them
+PEER_KEYS = {
+    "from", "user", "chat", "sender_chat", "sender_user", "forward_from", "forward_from_chat", "via_bot",
+    "new_chat_members", "left_chat_member", "sender_business_bot",
+}
+# Keys whose value is a bare user or chat id
+ID_KEYS = {"user_id", "chat_id", "migrate_to_chat_id", "migrate_from_chat_id"}
+# Personal data that replaying never needs
+DROPPED_KEYS = {"contact", "location", "venue", "last_name", "username", "bio", "phone_number"}
+
+class Anonymizer:
+    """Replace user and chat ids with stable pseudonyms and drop names.
+
+    The pseudonym is a keyed hash of the id, so one user keeps one id for
+    the whole recording (conversations and anti-flood still line up) while
+    the key, which is never written anywhere, is needed to go back. Admin
+    ids are kept so a replay also exercises the admin handlers. Message
+    text and file ids stay: the handlers cannot be replayed without them.
+    """
+
+    def __init__(self, key=None):
+        self.key = key or secrets.token_bytes(32)
+        self.keep = set(ADMIN_IDS)
+
+    def pseudonym(self, peer_id):
+        if peer_id in self.keep:
+            return peer_id
+        digest = hmac.new(self.key, str(peer_id).encode("ascii"), hashlib.sha256).digest()
+        # Positive ids are users and private chats, negative ones groups and channels
+        value = 10**9 + int.from_bytes(digest[:5], "big")
+        return value if peer_id > 0 else -value
+
+    def _peer(self, peer):
+        result = self.anonymize(peer)
+        if isinstance(peer.get("id"), int):
+            result["id"] = self.pseudonym(peer["id"])
+        if "first_name" in result:
+            result["first_name"] = f"User{result['id'] % 100000}"
+        if "title" in result:
+            result["title"] = f"Chat{abs(result['id']) % 100000}"
+        return result
+
+    def anonymize(self, value):
+        """A scrubbed copy of an update dict."""
+        if isinstance(value, list):
+            return [self.anonymize(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        result = {}
+        for key, item in value.items():
+            if key in DROPPED_KEYS:
+                continue
+            if key in PEER_KEYS and isinstance(item, dict):
+                result[key] = self._peer(item)
+            elif key in PEER_KEYS and isinstance(item, list):
+                result[key] = [self._peer(peer) if isinstance(peer, dict) else peer for peer in item]
+            elif key in ID_KEYS and isinstance(item, int):
+                result[key] = self.pseudonym(item)
+            elif key == "chat_instance":
+                result[key] = hmac.new(self.key, str(item).encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+            else:
+                result[key] = self.anonymize(item)
+        return result
+
+class UpdateRecorder:
+    """Append incoming updates to gzip-compressed JSONL files in RECORD_DIR.
+
+    The handler only puts (time, update) on a queue; a writer thread
+    anonymizes, serializes and compresses, so recording adds next to
+    nothing to the event loop. Each line is {"t": unix time, "update": ...}.
+    A file is closed after RECORD_FILE_BYTES of JSON and a new one started,
+    and only the newest RECORD_KEEP files are kept. The stream is flushed
+    whenever the queue runs empty, so a crash loses at most the updates
+    still queued and the file stays readable up to there.
+    """
+
+    def __init__(self, directory=RECORD_DIR, file_bytes=RECORD_FILE_BYTES, keep=RECORD_KEEP):
+        self.directory = directory
+        self.file_bytes = file_bytes
+        self.keep = keep
+        self.anonymizer = Anonymizer()
+        self.recorded = 0
+
+        self._queue = queue.SimpleQueue()
+        self._file = None
+        self._written = 0
+        self._sequence = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="update-recorder", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write what is queued and close the current file."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def record(self, update):
+        self._queue.put((time.time(), update))
+
+    # Writer thread
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            self._write(*item)
+            if self._queue.empty() and self._file is not None:
+                self._file.flush()
+        self._close()
+
+    def _write(self, timestamp, update):
+        try:
+            line = json.dumps(
+                {"t": round(timestamp, 3), "update": self.anonymizer.anonymize(update.to_dict())},
+                ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8") + b"\n"
+            if self._file is None or self._written >= self.file_bytes:
+                self._open()
+            self._file.write(line)
+            self._written += len(line)
+            self.recorded += 1
+        except Exception as e:
+            # A broken recording must never take the bot down
+            logger.error(f"Error recording update: {e}")
+
+    def _open(self):
+        self._close()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self._sequence += 1
+        # The pid keeps cluster workers from writing to the same file
+        name = f"{RECORD_PREFIX}{stamp}-{os.getpid()}-{self._sequence:04d}{RECORD_SUFFIX}"
+        path = os.path.join(self.directory, name)
+        self._file = gzip.open(path, "wb")
+        self._written = 0
+        self._rotate()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _rotate(self):
+        """Delete all but the newest self.keep recordings."""
+        for name in list_recordings(self.directory)[self.keep:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning(f"Could not delete old recording {name}: {e}")
+
+def list_recordings(directory=RECORD_DIR):
+    """Recording file names, newest first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted((n for n in names if n.startswith(RECORD_PREFIX) and n.endswith(RECORD_SUFFIX)), reverse=True)
+
+def read_recording(path):
+    """Yield (time, update dict) from a recording, stopping cleanly at a truncated end."""
+    with gzip.open(path, "rb") as f:
+        try:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry["t"], entry["update"]
+        except (EOFError, gzip.BadGzipFile, json.JSONDecodeError):
+            # Written up to the last flush by a process that did not shut down
+            logger.warning(f"{path} ends early, replaying what was recorded")
+
+update_recorder = UpdateRecorder()
+
+async def record_update(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Hand the raw update to the recorder (group -2, before anti-flood)."""
+    update_recorder.record(update)
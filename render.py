@@ -0,0 +1,109 @@
+import html
+import logging
+import re
+from collections import OrderedDict
+from config import RENDER_CACHE_SIZE, CAPTION_LIMIT, MESSAGE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# Templates take escaped fields; {description} is the part trimmed to fit
+TEMPLATES = {
+    "details": (
+        "📺 <b>{name}</b> ({id})\n\n"
+        "📝 <b>Tavsif:</b>\n{description}\n\n"
+        "🔍 <b>Kod:</b> {code}\n"
+        "🎭 <b>Janrlar:</b> {genres}\n"
+        "👑 <b>VIP:</b> {vip}\n"
+        "🎬 <b>Epizodlar soni:</b> {episode_count} ({status})"
+    ),
+    "episode": "📺 <b>{name}</b> - {episode}-qism",
+    "channel_anime": (
+        "🌟 <b>YANGI ANIME QO'SHILDI!</b> 🌟\n\n"
+        "📺 <b>{name}</b> ({id})\n\n"
+        "📝 <b>Tavsif:</b>\n{description}\n\n"
+        "🔍 <b>Kod:</b> {code}\n"
+        "📅 <b>Qo'shilgan sana:</b> {date}\n\n"
+        "🤖 <a href=\"{link}\">@{bot_username} orqali ko'ring!</a>"
+    ),
+    "trailer": "🎬 <b>{name}</b> - Treyler",
+    "notify_episode": "🔔 <b>{name}</b> - {episode}-qism chiqdi!",
+    "channel_episode": (
+        "🎬 <b>YANGI EPIZOD!</b> 🎬\n\n"
+        "📺 <b>{name}</b> - {episode}-qism\n\n"
+        "📅 <b>Qo'shilgan sana:</b> {date}\n\n"
+        "🤖 <a href=\"{link}\">@{bot_username} orqali ko'ring!</a>"
+    ),
+}
+
+_TAG = re.compile(r"<[^>]+>")
+
+# (template, anime id, catalog version, extra) -> caption, least recently used first
+_cache = OrderedDict()
+
+def escape(text):
+    return html.escape(str(text), quote=False)
+
+def visible_length(markup):
+    """Length Telegram counts for HTML text: tags removed, entities decoded, UTF-16 units."""
+    text = html.unescape(_TAG.sub("", markup))
+    return len(text.encode("utf-16-le")) // 2
+
+def _trim(text, limit):
+    """Cut plain text to at most `limit` UTF-16 units, ending with an ellipsis."""
+    if len(text.encode("utf-16-le")) // 2 <= limit:
+        return text
+    if limit <= 1:
+        return ""
+    encoded = text.encode("utf-16-le")[:(limit - 1) * 2]
+    return encoded.decode("utf-16-le", errors="ignore").rstrip() + "…"
+
+def _build(template, anime, extra, limit):
+    fields = {
+        "id": escape(anime["id"]),
+        "name": escape(anime["name"]),
+        "description": escape(anime.get("description", "")),
+        "code": escape(anime.get("code") or "N/A"),
+        "vip": "Ha" if anime.get("vip", False) else "Yoq",
+        "genres": escape(", ".join(anime.get("genres", [])) or "-"),
+        "status": "tugallangan" if anime.get("completed", False) else "davom etmoqda",
+        # Scheduled (not yet released) episodes are not counted
+        "episode_count": sum(1 for ep in anime.get("episodes", []) if "release_at" not in ep),
+        **{key: escape(value) for key, value in extra.items()},
+    }
+    text = TEMPLATES[template]
+
+    # Fit the free-text field into whatever room the rest of the caption leaves
+    field = "description" if "{description}" in text else "name"
+    room = limit - visible_length(text.format(**{**fields, field: ""}))
+    if room < 0:
+        logger.warning(f"Caption template {template} is longer than {limit} for {anime['id']}")
+    fields[field] = escape(_trim(str(anime.get(field, "")), max(room, 0)))
+    return text.format(**fields)
+
+def render(template, anime, limit=CAPTION_LIMIT, **extra):
+    """Return the escaped, length-limited HTML for one of TEMPLATES.
+
+    Results are cached per (template, anime, catalog version, extra), so a
+    caption is only built again after the catalog changes.
+    """
+    from database import catalog_store
+
+    key = (template, anime["id"], catalog_store.version, limit, tuple(sorted(extra.items())))
+    caption = _cache.get(key)
+    if caption is not None:
+        _cache.move_to_end(key)
+        return caption
+
+    caption = _build(template, anime, extra, limit)
+    _cache[key] = caption
+    if len(_cache) > RENDER_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return caption
+
+def render_caption(template, anime, **extra):
+    """Render for a media caption (1024 characters)."""
+    return render(template, anime, CAPTION_LIMIT, **extra)
+
+def render_message(template, anime, **extra):
+    """Render for a text message (4096 characters)."""
+    return render(template, anime, MESSAGE_LIMIT, **extra)
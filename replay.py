@@ -0,0 +1,231 @@
+"""Replay recorded updates through the bot against the local fake Bot API.
+
+Reads recordings written by recorder.py (RECORD_UPDATES in config.py),
+copies a data snapshot into a throwaway directory and feeds the updates
+through the real getUpdates polling loop and bot.build_application(), like
+loadtest.py. Reports end-to-end latency per update and the time spent in
+each handler callback, so two runs (before and after a change) can be
+compared on the traffic that was actually seen.
+
+Timing: --speed 0 sends everything as fast as possible, 1 keeps the recorded
+gaps, 2 halves them. Compressing time makes every user look like a flood,
+so anti-flood is left out at --speed 0 unless --antiflood is given.
+Recorded users have pseudonymous ids, so they are new users in the snapshot.
+
+Example:
+    python replay.py recordings/ --backup backups/backup-20250131-120000.json.gz
+    python replay.py recordings/updates-20250131-120000-4242-0001.jsonl.gz --speed 1
+"""
+import argparse
+import asyncio
+import functools
+import gzip
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from telegram.ext import Application
+
+from fake_bot_api import FakeBotAPI
+from loadtest import percentile
+
+
+def recording_files(paths):
+    """Recording files from the given files and directories, oldest first."""
+    from recorder import list_recordings
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [os.path.join(path, name) for name in reversed(list_recordings(path))]
+        else:
+            files.append(path)
+    return files
+
+
+def load_snapshot(args, workdir):
+    """Put data.json and users.json from the chosen snapshot into workdir."""
+    from config import DATA_FILE, USER_FILE
+    if args.backup:
+        with gzip.open(args.backup, "rb") as f:
+            files = json.loads(f.read())["files"]
+        for path in (DATA_FILE, USER_FILE):
+            with open(os.path.join(workdir, path), "w", encoding="utf-8") as f:
+                json.dump(files[path], f, ensure_ascii=False)
+    else:
+        for source, path in ((args.data, DATA_FILE), (args.users, USER_FILE)):
+            if os.path.exists(source):
+                shutil.copyfile(source, os.path.join(workdir, path))
+
+
+def time_handlers(application, timings, errors):
+    """Wrap every handler callback to record how long it runs, by name."""
+    from logs import iter_handlers
+
+    def timed(callback):
+        name = getattr(callback, "__name__", type(callback).__name__)
+
+        @functools.wraps(callback)
+        async def wrapper(update, context, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await callback(update, context, *args, **kwargs)
+            except Exception:
+                errors[name] += 1
+                raise
+            finally:
+                timings[name].append(time.perf_counter() - started)
+        return wrapper
+
+    for handler in iter_handlers(application):
+        handler.callback = timed(handler.callback)
+
+
+async def run(args):
+    random.seed(args.seed)
+    files = [os.path.abspath(path) for path in recording_files(args.recordings)]
+    if not files:
+        raise SystemExit("No recordings found")
+    args.data = os.path.abspath(args.data)
+    args.users = os.path.abspath(args.users)
+    if args.backup:
+        args.backup = os.path.abspath(args.backup)
+
+    # Work on a throwaway copy of the data files
+    workdir = tempfile.mkdtemp(prefix="bot-replay-")
+    load_snapshot(args, workdir)
+    os.chdir(workdir)
+
+    from recorder import read_recording
+    # Workers write one file each; merge them back into one timeline
+    entries = heapq.merge(*(read_recording(path) for path in files), key=lambda entry: entry[0])
+    if args.limit:
+        entries = itertools.islice(entries, args.limit)
+    entries = list(entries)
+    if not entries:
+        raise SystemExit("The recordings are empty")
+
+    server = FakeBotAPI(latency=args.latency, jitter=args.jitter, seed=args.seed).start()
+
+    # Imported here so bot modules pick up the temporary working directory
+    from bot import build_application
+    from logs import setup_logging
+    setup_logging()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    builder = (
+        Application.builder()
+        .token("123456:REPLAY")
+        .base_url(server.base_url)
+        .base_file_url(server.base_file_url)
+    )
+    if args.concurrent_updates > 1:
+        builder = builder.concurrent_updates(args.concurrent_updates)
+    application = build_application(builder, record_updates=False)
+
+    antiflood = args.antiflood or args.speed > 0
+    if not antiflood:
+        for handler in list(application.handlers.get(-1, [])):
+            application.remove_handler(handler, group=-1)
+
+    handler_timings = defaultdict(list)
+    handler_errors = defaultdict(int)
+    time_handlers(application, handler_timings, handler_errors)
+
+    queued = {}
+    latencies = []
+    done = asyncio.Event()
+    process_update = application.process_update
+
+    async def timed_process_update(update):
+        try:
+            await process_update(update)
+        finally:
+            started = queued.pop(update.update_id, None)
+            if started is not None:
+                latencies.append(time.perf_counter() - started)
+            if len(latencies) >= len(entries):
+                done.set()
+
+    application.process_update = timed_process_update
+
+    async with application:
+        await application.start()
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+
+        first = entries[0][0]
+        started = time.perf_counter()
+        for recorded_at, update in entries:
+            if args.speed > 0:
+                delay = started + (recorded_at - first) / args.speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            # No await in between, so polling cannot pick it up before it is recorded
+            update_id = server.push_update(update)
+            queued[update_id] = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(done.wait(), timeout=args.timeout)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - started
+
+        await application.updater.stop()
+        await application.stop()
+    server.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    report(args, files, entries, latencies, handler_timings, handler_errors, elapsed, antiflood, server, len(queued))
+
+
+def report(args, files, entries, latencies, handler_timings, handler_errors, elapsed, antiflood, server, unfinished):
+    span = entries[-1][0] - entries[0][0]
+
+    print(f"\n=== Replay {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} ===")
+    print(f"recordings:     {len(files)} files, {span:.1f}s of traffic")
+    print(f"speed:          {'as fast as possible' if args.speed <= 0 else f'{args.speed:g}x'}"
+          f"{'' if antiflood else ', anti-flood off'}")
+    print(f"updates sent:   {len(entries)}")
+    print(f"completed:      {len(latencies)} (unfinished: {unfinished})")
+    print(f"elapsed:        {elapsed:.2f}s")
+    print(f"throughput:     {len(latencies) / elapsed if elapsed else 0:.1f} updates/s")
+    print(f"latency p50:    {percentile(latencies, 50) * 1000:.1f} ms")
+    print(f"latency p99:    {percentile(latencies, 99) * 1000:.1f} ms")
+
+    print("\nper handler:              count     p50 ms     p99 ms     max ms   total s  errors")
+    for name, values in sorted(handler_timings.items(), key=lambda item: -sum(item[1])):
+        print(f"  {name:<22} {len(values):>8} {percentile(values, 50) * 1000:>10.2f} "
+              f"{percentile(values, 99) * 1000:>10.2f} {max(values) * 1000:>10.2f} "
+              f"{sum(values):>9.2f} {handler_errors[name]:>7}")
+
+    print("\nBot API calls:       count   429s")
+    for method, count in sorted(server.calls.items()):
+        print(f"  {method:<18} {count:>8} {server.throttled[method]:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recordings", nargs="+", help="recording files or directories of them")
+    parser.add_argument("--data", default="data.json", help="catalog snapshot to replay against")
+    parser.add_argument("--users", default="users.json", help="users snapshot to replay against")
+    parser.add_argument("--backup", help="take the snapshot from a backup.py archive instead")
+    parser.add_argument("--speed", type=float, default=0, help="0 = as fast as possible, 1 = real time")
+    parser.add_argument("--antiflood", action="store_true", help="keep anti-flood at --speed 0")
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N updates")
+    parser.add_argument("--latency", type=float, default=0.01, help="fake API latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency in seconds")
+    parser.add_argument("--concurrent-updates", type=int, default=1, help="Application concurrent_updates")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for handlers to finish")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
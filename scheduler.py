@@ -0,0 +1,111 @@
+import heapq
+import logging
+import time
+from datetime import datetime
+from config import RELEASES_FILE, RELEASE_RETRY_DELAY
+from storage import file_lock, read_json, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+RELEASE_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# Min-heap of [release_at, anime_id, episode_number], persisted in RELEASES_FILE.
+# A whole anime is stored as episode 0 rather than None, so entries with the
+# same time always compare (and the anime is published before its episodes).
+ANIME_RELEASE = 0
+release_heap = []
+
+# JobQueue of the running application and the job waiting for the heap top
+_job_queue = None
+_next_job = None
+
+def parse_release_time(text):
+    """Parse "YYYY-MM-DD HH:MM" (server local time) into a unix timestamp, or raise ValueError."""
+    return int(datetime.strptime(text.strip(), RELEASE_TIME_FORMAT).timestamp())
+
+def format_release_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime(RELEASE_TIME_FORMAT)
+
+def _load():
+    global release_heap
+    release_heap = [
+        [release_at, anime_id, ANIME_RELEASE if episode_number is None else episode_number]
+        for release_at, anime_id, episode_number in read_json(RELEASES_FILE, list)
+    ]
+    heapq.heapify(release_heap)
+
+def _save():
+    write_json_atomic(RELEASES_FILE, release_heap)
+
+def _reschedule():
+    """Keep exactly one job, due when the earliest release is."""
+    global _next_job
+    if _job_queue is None:
+        return
+    if _next_job is not None:
+        _next_job.schedule_removal()
+        _next_job = None
+    if release_heap:
+        delay = max(0, release_heap[0][0] - time.time())
+        _next_job = _job_queue.run_once(publish_due_releases, when=delay, name="releases")
+
+def schedule_release(release_at, anime_id, episode_number=None):
+    """Add a pending release; O(log n)."""
+    with file_lock(RELEASES_FILE):
+        # Another process may have added or published releases meanwhile
+        _load()
+        heapq.heappush(release_heap, [release_at, anime_id, episode_number or ANIME_RELEASE])
+        _save()
+    _reschedule()
+
+def forget_scheduled_releases(anime_id):
+    """Drop a deleted anime's pending releases, so a new anime reusing its id is not published early."""
+    global release_heap
+    with file_lock(RELEASES_FILE):
+        _load()
+        kept = [entry for entry in release_heap if entry[1] != anime_id]
+        if len(kept) == len(release_heap):
+            return
+        heapq.heapify(kept)
+        release_heap = kept
+        _save()
+    _reschedule()
+
+def pending_releases():
+    """Pending (release_at, anime_id, episode_number or None) releases, earliest first."""
+    return [
+        (release_at, anime_id, episode_number or None)
+        for release_at, anime_id, episode_number in sorted(release_heap)
+    ]
+
+async def publish_due_releases(context=None) -> None:
+    """Publish every release whose time has come (JobQueue callback)."""
+    global _next_job
+    _next_job = None
+    from database import publish_release
+
+    now = time.time()
+    due = []
+    with file_lock(RELEASES_FILE):
+        _load()
+        while release_heap and release_heap[0][0] <= now:
+            due.append(heapq.heappop(release_heap))
+        if due:
+            _save()
+
+    for release_at, anime_id, episode_number in due:
+        episode_number = episode_number or None
+        try:
+            await publish_release(anime_id, episode_number)
+        except Exception as e:
+            logger.error(f"Error publishing release {anime_id}/{episode_number}: {e}")
+            schedule_release(int(now) + RELEASE_RETRY_DELAY, anime_id, episode_number)
+
+    _reschedule()
+
+def init_scheduler(job_queue):
+    """Load pending releases and schedule the first one (overdue ones run at once)."""
+    global _job_queue
+    _job_queue = job_queue
+    _load()
+    _reschedule()
@@ -0,0 +1,107 @@
+import logging
+import time
+from collections import Counter
+from datetime import datetime
+from config import STATS_FILE, STATS_DAYS
+from storage import PendingStore
+
+logger = logging.getLogger(__name__)
+
+# Daily counter names
+SIGNUPS = "signups"
+VIP_ADDED = "vip_added"
+VIP_REMOVED = "vip_removed"
+ANIMES_ADDED = "animes_added"
+ANIMES_DELETED = "animes_deleted"
+EPISODES_ADDED = "episodes_added"
+
+# Running total only (no daily counter)
+EPISODES = "episodes"
+
+def _day(now=None):
+    return datetime.fromtimestamp(time.time() if now is None else now).strftime("%Y-%m-%d")
+
+def _count_episodes():
+    """Full scan, only used when STATS_FILE does not exist yet."""
+    from database import catalog_store, visible_episodes
+    return sum(visible_episodes(anime) for anime in catalog_store.records())
+
+class StatsCounters(PendingStore):
+    """Admin dashboard counters, updated by the database helpers as they run.
+
+    totals holds running all-time sums plus the current episode count;
+    days holds one Counter per day for the last STATS_DAYS days, and older
+    days are dropped as new ones start. flush_stats writes them from a
+    repeating job.
+    """
+
+    def __init__(self, days=STATS_DAYS):
+        super().__init__(STATS_FILE)
+        self.keep_days = days
+        self.totals = Counter()
+        self.days = {}  # "YYYY-MM-DD" -> Counter, oldest first
+        self.pending = []  # (day or None, name, amount)
+
+    def add(self, name, amount=1, now=None, daily=True):
+        day = _day(now) if daily else None
+        self.pending.append((day, name, amount))
+        self._apply(day, name, amount)
+
+    def _apply(self, day, name, amount):
+        self.totals[name] += amount
+        if day is None:
+            return
+        if day not in self.days:
+            self.days[day] = Counter()
+            # Days arrive in order, so only the oldest can fall out
+            while len(self.days) > self.keep_days:
+                del self.days[min(self.days)]
+        self.days[day][name] += amount
+
+    def day(self, day=None):
+        return self.days.get(day or _day(), Counter())
+
+    def recent_days(self, count):
+        """The last count days that have any counts, newest first."""
+        return sorted(self.days.items(), reverse=True)[:count]
+
+    # Persistence
+    def to_dict(self):
+        return {"totals": dict(self.totals), "days": {day: dict(c) for day, c in self.days.items()}}
+
+    def load(self, data):
+        if "totals" in data:
+            self.totals = Counter(data["totals"])
+        else:
+            self.totals = Counter({EPISODES: _count_episodes()})
+        self.days = {day: Counter(counts) for day, counts in sorted(data.get("days", {}).items())}
+        while len(self.days) > self.keep_days:
+            del self.days[min(self.days)]
+
+    def merge(self, data):
+        """Load the stored counters and replay the changes not flushed yet."""
+        changes, self.pending = self.pending, []
+        if "totals" not in data:
+            # No file yet: the seeded totals already include the changes
+            return
+        self.load(data)
+        for change in changes:
+            self._apply(*change)
+
+stats_counters = StatsCounters()
+
+def load_stats():
+    stats_counters.reload()
+
+def record_stat(name, amount=1, daily=True):
+    stats_counters.add(name, amount, daily=daily)
+
+def get_stats():
+    return stats_counters
+
+async def flush_stats(context=None) -> None:
+    """Write dashboard counters to disk if anything changed (JobQueue callback)."""
+    try:
+        stats_counters.flush()
+    except OSError as e:
+        logger.error(f"Error saving statistics: {e}")
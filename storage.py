@@ -0,0 +1,283 @@
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from config import CACHE_CHECK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock shared by every process using the same data file."""
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default()
+
+def write_json_atomic(path, data, **dump_kwargs):
+    """Write to a temporary file and rename it, so readers never see half a file."""
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **dump_kwargs)
+    os.replace(tmp_path, path)
+
+def file_signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+# Called with (store_name, message) after every local write; set by cluster.py
+_change_listener = None
+
+def set_change_listener(listener):
+    global _change_listener
+    _change_listener = listener
+
+def notify_change(store_name, message):
+    if _change_listener:
+        _change_listener(store_name, message)
+
+def _copy_field(value):
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+class CachedStore:
+    """In-memory copy of a JSON file holding a list of records keyed by id.
+
+    Reads are served from memory with an id index. The file carries a
+    "version" number that every write bumps under a file lock. Other
+    processes are told about each write through the change listener
+    ("upsert"/"delete" of one record plus the new version) and patch just
+    that record. A version gap or an unexpected file change (checked at most
+    every CACHE_CHECK_INTERVAL seconds) falls back to a full reload.
+    """
+
+    def __init__(self, name, path, list_key, id_key="id"):
+        self.name = name
+        self.path = path
+        self.list_key = list_key
+        self.id_key = id_key
+
+        self.data = None
+        self.index = {}
+        self.signature = None
+        self.checked_at = 0.0
+
+    @property
+    def version(self):
+        return self.get().get("version", 0)
+
+    def _default(self):
+        return {self.list_key: []}
+
+    def _set(self, data, signature):
+        self.data = data
+        self.index = {record[self.id_key]: record for record in data[self.list_key]}
+        self.signature = signature
+        self.checked_at = time.monotonic()
+
+    def reload(self):
+        """Read the whole file again."""
+        signature = file_signature(self.path)
+        self._set(read_json(self.path, self._default), signature)
+
+    def snapshot(self):
+        """A copy of the data that later writes do not change, for serializing in a thread.
+
+        Writes change records in place at most two levels deep (a field, or
+        an item of a list field such as an episode), so copying that far is
+        enough and far cheaper than serializing on the event loop.
+        """
+        data = self.get()
+        return {
+            **data,
+            self.list_key: [
+                {key: _copy_field(value) for key, value in record.items()}
+                for record in data[self.list_key]
+            ],
+        }
+
+    def get(self):
+        """Return the cached data, reloading it if the file changed behind our back."""
+        if self.data is None:
+            self.reload()
+        elif time.monotonic() - self.checked_at >= CACHE_CHECK_INTERVAL:
+            self.checked_at = time.monotonic()
+            if file_signature(self.path) != self.signature:
+                logger.info(f"{self.path} changed on disk, reloading")
+                self.reload()
+        return self.data
+
+    def get_record(self, record_id):
+        self.get()
+        return self.index.get(record_id)
+
+    def records(self):
+        return self.get()[self.list_key]
+
+    # Writes
+    @contextmanager
+    def _locked(self):
+        with file_lock(self.path):
+            # Another process may have written since our last look
+            if self.data is None or file_signature(self.path) != self.signature:
+                self.reload()
+            yield self.data
+
+    def _commit(self, op, record=None, record_id=None):
+        self.data["version"] = self.data.get("version", 0) + 1
+        write_json_atomic(self.path, self.data, indent=4)
+        self.signature = file_signature(self.path)
+        self.checked_at = time.monotonic()
+
+        message = {"op": op, "version": self.data["version"], "signature": self.signature}
+        if record is not None:
+            message["record"] = record
+        if record_id is not None:
+            message["id"] = record_id
+        notify_change(self.name, message)
+
+    def insert(self, record, unique=True):
+        """Append a record. With unique=True nothing happens if the id exists."""
+        with self._locked() as data:
+            if unique and record[self.id_key] in self.index:
+                return False
+            data[self.list_key].append(record)
+            self.index[record[self.id_key]] = record
+            self._commit("upsert", record=record)
+            return True
+
+    def update(self, record_id, mutate):
+        """Apply mutate(record) under the lock. Returns the record, or None if missing."""
+        with self._locked():
+            record = self.index.get(record_id)
+            if record is None:
+                return None
+            mutate(record)
+            self._commit("upsert", record=record)
+            return record
+
+    def delete(self, record_id):
+        with self._locked() as data:
+            record = self.index.pop(record_id, None)
+            if record is None:
+                return False
+            data[self.list_key].remove(record)
+            self._commit("delete", record_id=record_id)
+            return True
+
+    def replace_all(self, data):
+        """Overwrite the whole file (save_data / save_users)."""
+        with self._locked():
+            data["version"] = max(data.get("version", 0), self.data.get("version", 0))
+            self._set(data, self.signature)
+            self._commit("reload")
+
+    # Changes made by other processes
+    def apply_remote(self, message):
+        """Patch the cache with a change another process wrote."""
+        if self.data is None:
+            return
+
+        current = self.data.get("version", 0)
+        version = message["version"]
+        if version <= current:
+            return
+        if version != current + 1 or message["op"] == "reload":
+            # Missed a change (or a full rewrite): only a reload is safe
+            self.reload()
+            return
+
+        if message["op"] == "upsert":
+            record = message["record"]
+            existing = self.index.get(record[self.id_key])
+            if existing is None:
+                self.data[self.list_key].append(record)
+                self.index[record[self.id_key]] = record
+            else:
+                # Update in place so the list order and references stay valid
+                existing.clear()
+                existing.update(record)
+        elif message["op"] == "delete":
+            record = self.index.pop(message["id"], None)
+            if record is not None:
+                self.data[self.list_key].remove(record)
+
+        self.data["version"] = version
+        self.signature = tuple(message["signature"]) if message.get("signature") else None
+        self.checked_at = time.monotonic()
+
+class PendingStore:
+    """Base for in-memory state that processes share through one JSON file.
+
+    Changes are applied in memory at once and also kept in pending. flush()
+    re-reads the file under its lock, merge()s it (load it, then replay the
+    pending changes) and writes the result, so processes sharing the file
+    add up instead of overwriting each other; a failed write keeps the
+    changes for the next flush. Subclasses implement load, merge and to_dict.
+    """
+
+    def __init__(self, path, **dump_kwargs):
+        self.path = path
+        self.dump_kwargs = dump_kwargs
+        self.pending = []
+        self.signature = None
+
+    def load(self, data):
+        raise NotImplementedError
+
+    def merge(self, data):
+        """Load the stored data and replay the changes not flushed yet (clears pending)."""
+        raise NotImplementedError
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    def reload(self):
+        """Replace the in-memory state with the file, dropping unflushed changes."""
+        self.pending = []
+        self.signature = file_signature(self.path)
+        self.load(read_json(self.path, dict))
+
+    def refresh(self):
+        """Merge in what other processes wrote since our last read or flush."""
+        if file_signature(self.path) == self.signature:
+            return
+        with file_lock(self.path):
+            changes = list(self.pending)
+            self.signature = file_signature(self.path)
+            self.merge(read_json(self.path, dict))
+            # Nothing was written, so the changes are still to be flushed
+            self.pending = changes
+
+    def flush(self):
+        """Write the pending changes merged with the file; False if there were none."""
+        if not self.pending:
+            return False
+        changes = list(self.pending)
+        with file_lock(self.path):
+            self.merge(read_json(self.path, dict))
+            try:
+                write_json_atomic(self.path, self.to_dict(), **self.dump_kwargs)
+            except OSError:
+                # Keep the changes for the next flush
+                self.pending = changes + self.pending
+                raise
+            self.signature = file_signature(self.path)
+        return True
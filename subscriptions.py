@@ -0,0 +1,109 @@
+import logging
+from config import SUBSCRIPTIONS_FILE
+from storage import PendingStore
+
+logger = logging.getLogger(__name__)
+
+class SubscriptionStore(PendingStore):
+    """Subscribers of each anime, kept as anime id -> set of user ids.
+
+    Notifying the subscribers of an anime is one dict lookup however many
+    users there are.
+    """
+
+    def __init__(self):
+        super().__init__(SUBSCRIPTIONS_FILE, separators=(",", ":"))
+        self.subscribers = {}  # anime_id -> {user_id}
+        self.total = 0
+        # pending: (user_id, anime_id, subscribed) / (None, anime_id, False) to forget
+
+    def set(self, user_id, anime_id, subscribed):
+        self.pending.append((user_id, anime_id, subscribed))
+        self._apply(user_id, anime_id, subscribed)
+
+    def _apply(self, user_id, anime_id, subscribed):
+        users = self.subscribers.get(anime_id)
+        if user_id is None:
+            if users is not None:
+                self.total -= len(users)
+                del self.subscribers[anime_id]
+        elif subscribed:
+            if users is None:
+                users = self.subscribers[anime_id] = set()
+            if user_id not in users:
+                users.add(user_id)
+                self.total += 1
+        elif users is not None and user_id in users:
+            users.remove(user_id)
+            self.total -= 1
+            if not users:
+                del self.subscribers[anime_id]
+
+    def is_subscribed(self, user_id, anime_id):
+        return user_id in self.subscribers.get(anime_id, ())
+
+    def of(self, anime_id):
+        """A list of the anime's subscribers, safe to iterate while others change."""
+        return list(self.subscribers.get(anime_id, ()))
+
+    def count(self):
+        return self.total
+
+    def forget_anime(self, anime_id):
+        self.set(None, anime_id, False)
+
+    def to_dict(self):
+        return {anime_id: sorted(users) for anime_id, users in self.subscribers.items()}
+
+    def load(self, data):
+        self.subscribers = {anime_id: set(users) for anime_id, users in data.items() if users}
+        self.total = sum(len(users) for users in self.subscribers.values())
+
+    def merge(self, data):
+        """Load the stored subscriptions and replay the changes not flushed yet."""
+        changes, self.pending = self.pending, []
+        self.load(data)
+        for change in changes:
+            self._apply(*change)
+
+subscription_store = SubscriptionStore()
+
+def load_subscriptions():
+    subscription_store.reload()
+
+def toggle_subscription(user_id, anime_id):
+    """Subscribe or unsubscribe; returns True if the user is now subscribed."""
+    subscribed = not subscription_store.is_subscribed(user_id, anime_id)
+    subscription_store.set(user_id, anime_id, subscribed)
+    return subscribed
+
+def unsubscribe(user_id, anime_id):
+    if subscription_store.is_subscribed(user_id, anime_id):
+        subscription_store.set(user_id, anime_id, False)
+
+def is_subscribed(user_id, anime_id):
+    return subscription_store.is_subscribed(user_id, anime_id)
+
+def count_subscriptions():
+    return subscription_store.count()
+
+def get_subscribers(anime_id):
+    """Subscribers of an anime, including those who subscribed through other processes.
+
+    Those are only on disk after their process flushed (SUBSCRIPTIONS_FLUSH_INTERVAL).
+    """
+    try:
+        subscription_store.refresh()
+    except OSError as e:
+        logger.error(f"Error reading subscriptions: {e}")
+    return subscription_store.of(anime_id)
+
+def forget_anime_subscriptions(anime_id):
+    subscription_store.forget_anime(anime_id)
+
+async def flush_subscriptions(context=None) -> None:
+    """Write subscriptions to disk if anything changed (JobQueue callback)."""
+    try:
+        subscription_store.flush()
+    except OSError as e:
+        logger.error(f"Error saving subscriptions: {e}")
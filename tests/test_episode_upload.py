@@ -0,0 +1,70 @@
+import asyncio
+import time
+import warnings
+
+import pytest
+from telegram import Update
+from telegram.ext import Application
+
+import bot
+import database
+from config import ADMIN_IDS
+from fake_bot_api import FakeBotAPI
+from storage import CachedStore
+
+ADMIN = {"id": ADMIN_IDS[0], "is_bot": False, "first_name": "Admin"}
+CHAT = {"id": ADMIN_IDS[0], "type": "private"}
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, "catalog_store", CachedStore("data", database.DATA_FILE, "animes"))
+    database.catalog_store.insert({"id": "ANM001", "name": "Naruto", "description": "", "code": "naruto", "episodes": []})
+
+
+def callback(update_id, data):
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": ADMIN, "chat_instance": "1", "data": data,
+        "message": {"message_id": 1, "date": 0, "chat": CHAT, "text": "..."},
+    }}
+
+
+def message(update_id, text):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "chat": CHAT, "from": ADMIN, "text": text,
+    }}
+
+
+async def run_updates(updates):
+    """Process the updates in order; returns the texts of the messages the bot sent."""
+    server = FakeBotAPI().start()
+    sent = []
+    server.add_listener(lambda method, params: sent.append(params.get("text")) if method.lower() == "sendmessage" else None)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        application = bot.build_application(
+            Application.builder().token("123456:TEST").base_url(server.base_url).base_file_url(server.base_file_url),
+            record_updates=False,
+        )
+    try:
+        async with application:
+            for update in updates:
+                await application.process_update(Update.de_json(update, application.bot))
+    finally:
+        server.stop()
+    return sent
+
+
+def test_search_button_ends_the_upload():
+    sent = asyncio.run(run_updates([
+        callback(1, "add_episode_to_ANM001"),
+        callback(2, "search"),
+        message(3, "naruto"),
+        # Would be taken as an episode number if the upload were still going
+        message(4, "5"),
+    ]))
+
+    assert sent[0].startswith("Qidiruv natijalari")
+    assert len(sent) == 1
+    assert database.get_anime_by_id("ANM001")["episodes"] == []
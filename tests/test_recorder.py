@@ -0,0 +1,42 @@
+import json
+
+from recorder import Anonymizer
+
+USER = {"id": 555001, "is_bot": False, "first_name": "Aziza", "last_name": "Karimova", "username": "aziza"}
+FRIEND = {"id": 555002, "is_bot": False, "first_name": "Bobur", "username": "bobur"}
+GROUP = {"id": -100555003, "type": "supergroup", "title": "Anime muxlislari"}
+
+
+def recorded(update):
+    return json.dumps(Anonymizer(key=b"test").anonymize(update), ensure_ascii=False)
+
+
+def test_no_raw_ids_or_names():
+    update = {
+        "update_id": 1,
+        "message": {
+            "message_id": 7,
+            "date": 0,
+            "from": USER,
+            "chat": GROUP,
+            "new_chat_members": [USER, FRIEND],
+            "left_chat_member": FRIEND,
+            "users_shared": {"request_id": 1, "users": [{"user_id": 555002}]},
+            "text": "salom",
+        },
+    }
+
+    line = recorded(update)
+
+    for secret in ("555001", "555002", "555003", "Aziza", "Karimova", "aziza", "Bobur", "Anime muxlislari"):
+        assert secret not in line
+    assert "salom" in line
+
+
+def test_same_user_same_pseudonym():
+    update = {"message": {"from": USER, "chat": GROUP, "new_chat_members": [USER]}}
+
+    message = json.loads(recorded(update))["message"]
+
+    assert message["from"]["id"] == message["new_chat_members"][0]["id"]
+    assert message["chat"]["id"] < 0
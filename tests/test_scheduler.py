@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+import database
+import scheduler
+from storage import CachedStore
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(scheduler, "release_heap", [])
+    monkeypatch.setattr(database, "catalog_store", CachedStore("data", database.DATA_FILE, "animes"))
+
+
+def make_anime(**fields):
+    return {"id": "ANM001", "name": "X", "description": "", "code": "x", "episodes": [], **fields}
+
+
+def test_anime_and_episode_at_the_same_time():
+    scheduler.schedule_release(1000, "ANM001", 2)
+    scheduler.schedule_release(1000, "ANM001")
+    scheduler.schedule_release(1000, "ANM001", 1)
+
+    assert scheduler.pending_releases() == [
+        (1000, "ANM001", None),
+        (1000, "ANM001", 1),
+        (1000, "ANM001", 2),
+    ]
+
+
+def test_due_releases_publish_anime_first(monkeypatch):
+    published = []
+
+    async def publish_release(anime_id, episode_number=None):
+        published.append((anime_id, episode_number))
+
+    monkeypatch.setattr(database, "publish_release", publish_release)
+    scheduler.schedule_release(1000, "ANM001", 1)
+    scheduler.schedule_release(1000, "ANM001")
+
+    asyncio.run(scheduler.publish_due_releases())
+
+    assert published == [("ANM001", None), ("ANM001", 1)]
+    assert scheduler.pending_releases() == []
+
+
+def test_old_files_with_none_still_load(tmp_path):
+    (tmp_path / scheduler.RELEASES_FILE).write_text('[[1000, "ANM001", null], [1000, "ANM001", 3]]')
+
+    scheduler._load()
+
+    assert scheduler.pending_releases() == [(1000, "ANM001", None), (1000, "ANM001", 3)]
+
+
+def test_rescheduled_episode_waits_for_its_new_time():
+    now = time.time()
+    database.catalog_store.insert(make_anime())
+    database.add_episode_to_anime("ANM001", 1, "video1", release_at=now + 100)
+    database.add_episode_to_anime("ANM001", 1, "video1", release_at=now + 5000)
+
+    # What the old heap entry does once its time comes
+    asyncio.run(database.publish_release("ANM001", 1))
+
+    assert database.get_anime_by_id("ANM001")["episodes"][0]["release_at"] == now + 5000
+
+
+def test_deleted_anime_releases_do_not_publish_its_successor():
+    now = time.time()
+    database.add_anime_to_db(make_anime(release_at=now + 100))
+    database.delete_anime_from_db("ANM001")
+
+    assert scheduler.pending_releases() == []
+
+    # generate_anime_id hands the freed id to the next anime
+    database.add_anime_to_db(make_anime(release_at=now + 5000))
+    asyncio.run(database.publish_release("ANM001"))
+
+    assert database.get_anime_by_id("ANM001")["release_at"] == now + 5000
+
+
+def test_scheduled_episodes_count_when_published(monkeypatch):
+    import stats
+    monkeypatch.setattr(stats, "stats_counters", stats.StatsCounters())
+    now = time.time()
+    database.catalog_store.insert(make_anime())
+    database.add_episode_to_anime("ANM001", 1, "video1", release_at=now + 100)
+
+    assert stats.stats_counters.totals[stats.EPISODES] == 0
+
+    def due(anime):
+        anime["episodes"][0]["release_at"] = now - 1
+
+    database.catalog_store.update("ANM001", due)
+    asyncio.run(database.publish_release("ANM001", 1))
+
+    assert stats.stats_counters.totals[stats.EPISODES] == 1
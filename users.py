@@ -0,0 +1,380 @@
+import asyncio
+import base64
+import logging
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from storage import file_lock, read_json, write_json_atomic, file_signature, notify_change
+from config import CACHE_CHECK_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+def _pack(data):
+    return base64.b64encode(data).decode("ascii")
+
+def pack_snapshot(columns):
+    """UserTable.to_dict() from UserTable.snapshot(); the slow part, so it can run in a thread."""
+    return {key: _pack(value) if isinstance(value, bytes) else value for key, value in columns.items()}
+
+def _unpack_array(typecode, text, byteorder):
+    values = array(typecode, base64.b64decode(text or ""))
+    if byteorder != sys.byteorder:
+        values.byteswap()
+    return values
+
+class StringColumn:
+    """Strings packed into one UTF-8 buffer and decoded on access.
+
+    Costs the encoded bytes plus an 8-byte end offset each, against 50+
+    bytes for a str object. None is stored as the empty string.
+    """
+
+    def __init__(self, blob=b"", ends=None):
+        self.blob = bytearray(blob)
+        self.ends = ends if ends is not None else array("Q")
+
+    def append(self, value):
+        if value:
+            self.blob += value.encode("utf-8")
+        self.ends.append(len(self.blob))
+
+    def __getitem__(self, row):
+        start = self.ends[row - 1] if row else 0
+        return self.blob[start:self.ends[row]].decode("utf-8") or None
+
+    def __len__(self):
+        return len(self.ends)
+
+class UserTable:
+    """users.json kept as columns instead of one dict per user.
+
+    Row r is the r-th user to join: ids[r] (int64), joined[r] (unix time),
+    usernames[r] / first_names[r] (packed UTF-8) and bit r of the vip
+    bitset. order holds the row numbers sorted by user id, so a lookup is a
+    binary search and a new user costs one insert into it. At a million
+    users this is about 50 MB instead of several hundred.
+
+    The file stores each column as base64 of its raw bytes, so loading and
+    saving are a few bulk copies rather than a million small objects. The
+    old {"users": [...]} layout is converted on first read.
+
+    It is shared between processes like CachedStore: versioned, written
+    under a file lock, and other processes patch their copy from change
+    notifications. New users are only kept in pending until flush() writes
+    them in one batch; VIP changes are written at once. Both copy the
+    columns on the event loop and encode and write them in a thread.
+    """
+
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+
+        self.loaded = False
+        self.file_version = 0
+        self.signature = None
+        self.checked_at = 0.0
+        self.pending = []  # records of users added since the last write
+        self._write_lock = asyncio.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.ids = array("q")
+        self.order = array("I")
+        self.joined = array("q")
+        self.usernames = StringColumn()
+        self.first_names = StringColumn()
+        self.vip = bytearray()
+        self.vip_count = 0
+
+    # Loading and saving
+    def _load(self, data, signature):
+        self._clear()
+        if "users" in data:
+            self._load_records(data["users"])
+        elif "ids" in data:
+            byteorder = data.get("byteorder", sys.byteorder)
+            self.ids = _unpack_array("q", data["ids"], byteorder)
+            self.joined = _unpack_array("q", data["joined"], byteorder)
+            self.usernames = StringColumn(
+                base64.b64decode(data["usernames"]), _unpack_array("Q", data["username_ends"], byteorder)
+            )
+            self.first_names = StringColumn(
+                base64.b64decode(data["first_names"]), _unpack_array("Q", data["first_name_ends"], byteorder)
+            )
+            self.vip = bytearray(base64.b64decode(data["vip"]))
+            self.vip_count = sum(bin(byte).count("1") for byte in self.vip)
+        self.order = array("I", sorted(range(len(self.ids)), key=self.ids.__getitem__))
+
+        self.file_version = data.get("version", 0)
+        self.signature = signature
+        self.checked_at = time.monotonic()
+        self.loaded = True
+
+        # Users added here but not written yet
+        for record in self.pending:
+            if self._row(record["id"]) is None:
+                self._append(record)
+
+    def _load_records(self, users):
+        """Old layout: one dict per user with a "%Y-%m-%d %H:%M:%S" joined_date."""
+        self.vip = bytearray((len(users) + 7) // 8)
+        for row, user in enumerate(users):
+            self.ids.append(user["id"])
+            self.joined.append(self._parse_joined(user.get("joined_date")))
+            self.usernames.append(user.get("username"))
+            self.first_names.append(user.get("first_name"))
+            if user.get("vip", False):
+                self._set_vip(row, True)
+
+    @staticmethod
+    def _parse_joined(text):
+        try:
+            return int(datetime.fromisoformat(text).timestamp())
+        except (TypeError, ValueError):
+            return 0
+
+    def reload(self):
+        """Read the whole file again."""
+        signature = file_signature(self.path)
+        self._load(read_json(self.path, dict), signature)
+
+    def _check(self):
+        """Reload if the file changed behind our back (at most every CACHE_CHECK_INTERVAL)."""
+        if not self.loaded:
+            self.reload()
+        elif time.monotonic() - self.checked_at >= CACHE_CHECK_INTERVAL:
+            self.checked_at = time.monotonic()
+            if file_signature(self.path) != self.signature:
+                logger.info(f"{self.path} changed on disk, reloading")
+                self.reload()
+
+    def to_dict(self):
+        """The file contents."""
+        self._check()
+        return self._columns()
+
+    def snapshot(self):
+        """Byte copies of the columns; pack_snapshot turns them into the file contents."""
+        self._check()
+        return self._columns(bytes)
+
+    def _columns(self, pack=_pack):
+        return {
+            "version": self.file_version,
+            "byteorder": sys.byteorder,
+            "ids": pack(self.ids),
+            "joined": pack(self.joined),
+            "usernames": pack(self.usernames.blob),
+            "username_ends": pack(self.usernames.ends),
+            "first_names": pack(self.first_names.blob),
+            "first_name_ends": pack(self.first_names.ends),
+            "vip": pack(self.vip),
+        }
+
+    # Columns
+    def _row(self, user_id):
+        i = bisect_left(self.order, user_id, key=self.ids.__getitem__)
+        if i < len(self.order) and self.ids[self.order[i]] == user_id:
+            return self.order[i]
+        return None
+
+    def _is_vip_row(self, row):
+        return bool(self.vip[row >> 3] & (1 << (row & 7)))
+
+    def _set_vip(self, row, value):
+        if self._is_vip_row(row) == value:
+            return
+        self.vip[row >> 3] ^= 1 << (row & 7)
+        self.vip_count += 1 if value else -1
+
+    def _append(self, record):
+        row = len(self.ids)
+        self.ids.append(record["id"])
+        self.joined.append(record["joined"])
+        self.usernames.append(record["username"])
+        self.first_names.append(record["first_name"])
+        if row >> 3 >= len(self.vip):
+            self.vip.append(0)
+        self.order.insert(bisect_left(self.order, record["id"], key=self.ids.__getitem__), row)
+        if record["vip"]:
+            self._set_vip(row, True)
+        return row
+
+    def _record(self, row):
+        return {
+            "id": self.ids[row],
+            "username": self.usernames[row],
+            "first_name": self.first_names[row],
+            "joined": self.joined[row],
+            "vip": self._is_vip_row(row),
+        }
+
+    # Reads
+    @property
+    def version(self):
+        self._check()
+        return self.file_version
+
+    def __contains__(self, user_id):
+        self._check()
+        return self._row(user_id) is not None
+
+    def __len__(self):
+        self._check()
+        return len(self.ids)
+
+    def is_vip(self, user_id):
+        self._check()
+        row = self._row(user_id)
+        return row is not None and self._is_vip_row(row)
+
+    def get_record(self, user_id):
+        """The user as a dict (built on demand), or None."""
+        self._check()
+        row = self._row(user_id)
+        return None if row is None else self._record(row)
+
+    def page(self, offset, limit):
+        """Users in join order, as dicts."""
+        self._check()
+        return [self._record(row) for row in range(offset, min(offset + limit, len(self.ids)))]
+
+    # Writes
+    @contextmanager
+    def _locked(self):
+        with file_lock(self.path):
+            # Another process may have written since our last look
+            if not self.loaded or file_signature(self.path) != self.signature:
+                self.reload()
+            yield
+
+    def _commit(self, op, records=()):
+        """Write the file; pending users go out with it and with the notification."""
+        records = self.pending + list(records)
+        self.file_version += 1
+        try:
+            write_json_atomic(self.path, self._columns())
+        except OSError:
+            self.file_version -= 1
+            raise
+        self.pending = []
+        self.signature = file_signature(self.path)
+        self.checked_at = time.monotonic()
+
+        message = {"op": op, "version": self.file_version, "signature": self.signature}
+        if op == "upsert":
+            message["records"] = records
+        notify_change(self.name, message)
+
+    def add(self, user_id, username, first_name, joined=None):
+        """Add a user in memory; flush() writes it. Returns False if the id is already there."""
+        self._check()
+        if self._row(user_id) is not None:
+            return False
+        record = {
+            "id": user_id,
+            "username": username,
+            "first_name": first_name,
+            "joined": int(time.time() if joined is None else joined),
+            "vip": False,
+        }
+        self._append(record)
+        self.pending.append(record)
+        return True
+
+    async def _commit_async(self, change=None):
+        """Apply change() and write the file without blocking the event loop.
+
+        change() returns the records it changed (for the notification) or
+        None to write nothing. The columns are copied here and encoded and
+        written in a thread; if another process wrote the file meanwhile,
+        its file is loaded, change() applied again and the write retried.
+        """
+        async with self._write_lock:
+            while True:
+                if not self.loaded or file_signature(self.path) != self.signature:
+                    self.reload()
+                changed = change() if change else []
+                if changed is None:
+                    return
+                records = self.pending + changed
+                version = self.file_version + 1
+                columns = self._columns(bytes)
+                columns["version"] = version
+                signature = await asyncio.to_thread(self._write_file, columns, self.signature)
+                if signature is not None:
+                    break
+
+            # Users added while the file was written stay pending
+            written = {id(record) for record in records}
+            self.pending = [record for record in self.pending if id(record) not in written]
+            self.file_version = version
+            self.signature = signature
+            self.checked_at = time.monotonic()
+            notify_change(self.name, {"op": "upsert", "version": version, "signature": signature, "records": records})
+
+    def _write_file(self, columns, expected):
+        """Write the columns unless the file changed since expected; the new signature or None."""
+        with file_lock(self.path):
+            if file_signature(self.path) != expected:
+                return None
+            write_json_atomic(self.path, pack_snapshot(columns))
+            return file_signature(self.path)
+
+    async def flush(self):
+        """Write the users added since the last write, if any."""
+        if self.pending:
+            await self._commit_async()
+
+    async def set_vip(self, user_id, value=None):
+        """Set (or with value=None flip) the VIP flag. Returns the new flag, or None if missing."""
+        flags = []
+
+        def change():
+            row = self._row(user_id)
+            if row is None:
+                return None
+            if not flags:
+                flags.append(not self._is_vip_row(row) if value is None else value)
+            self._set_vip(row, flags[0])
+            return [self._record(row)]
+
+        await self._commit_async(change)
+        return flags[0] if flags else None
+
+    def replace_all(self, data):
+        """Overwrite the whole file (this layout or the old list of dicts)."""
+        with self._locked():
+            version = max(data.get("version", 0), self.file_version)
+            self.pending = []
+            self._load(data, self.signature)
+            self.file_version = version
+            self._commit("reload")
+
+    # Changes made by other processes
+    def apply_remote(self, message):
+        """Patch the columns with a change another process wrote."""
+        if not self.loaded:
+            return
+
+        version = message["version"]
+        if version <= self.file_version:
+            return
+        if version != self.file_version + 1 or message["op"] != "upsert":
+            # Missed a change (or a full rewrite): only a reload is safe
+            self.reload()
+            return
+
+        for record in message["records"]:
+            row = self._row(record["id"])
+            if row is None:
+                self._append(record)
+            else:
+                self._set_vip(row, record["vip"])
+
+        self.file_version = version
+        self.signature = tuple(message["signature"]) if message.get("signature") else None
+        self.checked_at = time.monotonic()
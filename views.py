@@ -0,0 +1,181 @@
+import heapq
+import logging
+import time
+from collections import Counter, deque
+from config import VIEWS_FILE, TRENDING_SIZE, TRENDING_WINDOW, TRENDING_BUCKET
+from storage import PendingStore
+
+logger = logging.getLogger(__name__)
+
+class ViewCounters(PendingStore):
+    """In-memory view counters with a sliding-window top-K.
+
+    Views are counted in memory and written to VIEWS_FILE by the repeating
+    flush_views job, so a view never costs a file write; views since the
+    last flush are replayed onto the file by PendingStore.flush. The trending
+    window is a deque of (bucket_start, Counter) buckets; window_totals holds
+    their sum and top is kept sorted incrementally, so reading the top list
+    is O(K).
+    """
+
+    def __init__(self, size=TRENDING_SIZE, window=TRENDING_WINDOW, bucket=TRENDING_BUCKET):
+        super().__init__(VIEWS_FILE)
+        self.size = size
+        self.window = window
+        self.bucket = bucket
+
+        self.anime_totals = Counter()
+        self.episode_totals = Counter()
+        self.names = {}
+
+        self.buckets = deque()
+        self.window_totals = Counter()
+        self.top = []  # anime ids, highest window count first
+        # pending: ("view", anime, episode_number, time) / ("forget", anime_id)
+
+    # Sliding window
+    def _bucket_start(self, now):
+        return int(now // self.bucket * self.bucket)
+
+    def _expire(self, now):
+        """Drop buckets that left the window and rebuild the top list if needed."""
+        expired = False
+        while self.buckets and self.buckets[0][0] <= now - self.window:
+            _, counts = self.buckets.popleft()
+            for anime_id, count in counts.items():
+                self.window_totals[anime_id] -= count
+                if self.window_totals[anime_id] <= 0:
+                    del self.window_totals[anime_id]
+            expired = True
+        if expired:
+            self._rebuild_top()
+
+    def _rebuild_top(self):
+        self.top = heapq.nlargest(self.size, self.window_totals, key=self.window_totals.__getitem__)
+
+    def _bump_top(self, anime_id):
+        """Move anime_id to its place in the top list after its count grew."""
+        count = self.window_totals[anime_id]
+        if anime_id in self.top:
+            i = self.top.index(anime_id)
+        elif len(self.top) < self.size:
+            self.top.append(anime_id)
+            i = len(self.top) - 1
+        elif count > self.window_totals[self.top[-1]]:
+            self.top[-1] = anime_id
+            i = len(self.top) - 1
+        else:
+            return
+
+        while i > 0 and self.window_totals[self.top[i - 1]] < count:
+            self.top[i - 1], self.top[i] = self.top[i], self.top[i - 1]
+            i -= 1
+
+    # Recording
+    def record(self, anime, episode_number=None, now=None):
+        """Count one view of an anime (and optionally one of its episodes)."""
+        if now is None:
+            now = time.time()
+        self.pending.append(("view", {"id": anime["id"], "name": anime["name"]}, episode_number, now))
+        self._apply_view(anime, episode_number, now)
+
+    def _apply_view(self, anime, episode_number, now):
+        anime_id = anime["id"]
+
+        self.names[anime_id] = anime["name"]
+        self.anime_totals[anime_id] += 1
+        if episode_number is not None:
+            self.episode_totals[f"{anime_id}:{episode_number}"] += 1
+
+        self._expire(now)
+        start = self._bucket_start(now)
+        # Views replayed after a merge can be older than the newest bucket:
+        # find their bucket from the right, so the deque stays sorted by start
+        i = len(self.buckets)
+        while i > 0 and self.buckets[i - 1][0] > start:
+            i -= 1
+        if i > 0 and self.buckets[i - 1][0] == start:
+            counts = self.buckets[i - 1][1]
+        elif self.buckets and start <= self.buckets[-1][0] - self.window:
+            # Already out of the window; it only counts in the totals
+            return
+        else:
+            counts = Counter()
+            self.buckets.insert(i, (start, counts))
+        counts[anime_id] += 1
+        self.window_totals[anime_id] += 1
+        self._bump_top(anime_id)
+
+    def forget(self, anime_id):
+        """Remove a deleted anime from every counter."""
+        self.pending.append(("forget", anime_id))
+        self._apply_forget(anime_id)
+
+    def _apply_forget(self, anime_id):
+        self.anime_totals.pop(anime_id, None)
+        self.names.pop(anime_id, None)
+        prefix = f"{anime_id}:"
+        for key in [k for k in self.episode_totals if k.startswith(prefix)]:
+            del self.episode_totals[key]
+        for _, counts in self.buckets:
+            counts.pop(anime_id, None)
+        self.window_totals.pop(anime_id, None)
+        if anime_id in self.top:
+            self._rebuild_top()
+
+    def trending(self, now=None):
+        """Return [(anime_id, name, views_in_window), ...], highest first."""
+        self._expire(time.time() if now is None else now)
+        return [(anime_id, self.names.get(anime_id, anime_id), self.window_totals[anime_id])
+                for anime_id in self.top]
+
+    # Persistence
+    def to_dict(self):
+        return {
+            "animes": dict(self.anime_totals),
+            "episodes": dict(self.episode_totals),
+            "names": dict(self.names),
+            "buckets": [[start, dict(counts)] for start, counts in self.buckets],
+        }
+
+    def load(self, data):
+        self.anime_totals = Counter(data.get("animes", {}))
+        self.episode_totals = Counter(data.get("episodes", {}))
+        self.names = data.get("names", {})
+        self.buckets = deque((start, Counter(counts)) for start, counts in data.get("buckets", []))
+        self.window_totals = Counter()
+        for _, counts in self.buckets:
+            self.window_totals.update(counts)
+        self._expire(time.time())
+        self._rebuild_top()
+
+    def merge(self, data):
+        """Load the stored counters and replay the views not flushed yet."""
+        events, self.pending = self.pending, []
+        self.load(data)
+        for event in events:
+            if event[0] == "view":
+                self._apply_view(*event[1:])
+            else:
+                self._apply_forget(event[1])
+
+view_counters = ViewCounters()
+
+def load_views():
+    view_counters.reload()
+
+def record_view(anime, episode_number=None):
+    view_counters.record(anime, episode_number)
+
+def forget_anime_views(anime_id):
+    view_counters.forget(anime_id)
+
+def get_trending():
+    return view_counters.trending()
+
+async def flush_views(context=None) -> None:
+    """Write view counters to disk if anything changed (JobQueue callback)."""
+    try:
+        view_counters.flush()
+    except OSError as e:
+        logger.error(f"Error saving view counters: {e}")